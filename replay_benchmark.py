@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import numpy as np
+import cv2
+from PIL import Image
+
+import report_extraction as extraction
+from report_extraction import AutomationManager, ReplayScreen, TemplateMatcher, RunMetrics, load_report_config
+
+REPORTS = ["duk008", "ic01", "accruals", "provision"]
+CONFIG_DIRS = ["config", "config/DHJQ1436", "config/TRCX4245"]
+CONFIDENCES = [0.8, 0.9, 0.95, 0.99, 0.999]
+LABELS_FILE = "labels.json"
+# Screenshot name suffixes written by StepExecutor and whether the template is on the frame
+LABEL_SUFFIXES = {
+    "_check_notfound": False,
+    "_check_found": True,
+    "_current_status": True,
+    "_still_visible": True,
+    "_disappeared": False,
+    "_notfound": False,
+}
+# Values used by the login and extract steps when .env does not provide them
+REPLAY_ENV = {
+    "USERNAME": "replay",
+    "PASSWORD": "replay",
+    "DATABASE": "replay",
+    "LOCAL_DESTINATION_FOLDER_PATH": "/tmp/replay",
+}
+
+
+def recording_folder(recordings, config_dir, report_name):
+    """
+    Recordings of a variant (screenshots/DHJQ1436/duk008) are used when they exist,
+    otherwise the ones of the report (screenshots/duk008).
+    """
+    variant = os.path.relpath(config_dir, "config")
+    candidates = [os.path.join(recordings, report_name)]
+    if variant != ".":
+        candidates.insert(0, os.path.join(recordings, variant, report_name))
+    for folder in candidates:
+        if os.path.isdir(folder):
+            return folder
+    return None
+
+
+def load_frame(path):
+    with Image.open(path) as image:
+        return cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2GRAY)
+
+
+def load_labels(folder, templates):
+    """
+    Ground truth of the frames: labels.json of the recording, as
+    {"<frame file>": {"<template path>": true|false}}.
+    Returns:
+        dict: (frame path, template path) to True when the template is on the frame.
+    """
+    labels = {}
+    labels_path = os.path.join(folder, LABELS_FILE)
+    if os.path.isfile(labels_path):
+        with open(labels_path) as f:
+            for frame_name, frame_labels in json.load(f).items():
+                for template, present in frame_labels.items():
+                    if template in templates:
+                        labels[(os.path.join(folder, frame_name), template)] = bool(present)
+    return labels
+
+
+def name_labels(frames, templates):
+    """
+    Labels implied by the screenshot names, e.g. 4_en_loading_disappeared.png. The
+    names were written from the matcher's own decision at MATCH_CONFIDENCE, so their
+    rates only tell how far a threshold moves away from that decision, not how
+    accurate the matcher is.
+    Returns:
+        dict: (frame path, template path) to True when the name says the template was found.
+    """
+    by_name = {os.path.splitext(os.path.basename(template))[0]: template for template in templates}
+    labels = {}
+    for frame in frames:
+        name = os.path.splitext(os.path.basename(frame))[0]
+        for suffix, present in LABEL_SUFFIXES.items():
+            if name.endswith(suffix):
+                template = by_name.get(name[:-len(suffix)])
+                if template:
+                    labels[(frame, template)] = present
+                break
+    return labels
+
+
+def error_rates(labels, scores, confidences):
+    """
+    Returns:
+        dict: Label counts and, per confidence, the false positives and negatives.
+    """
+    positives = sum(labels.values())
+    negatives = len(labels) - positives
+    rates = {}
+    for confidence in confidences:
+        false_positives = sum(1 for key, present in labels.items() if not present and scores[key] >= confidence)
+        false_negatives = sum(1 for key, present in labels.items() if present and scores[key] < confidence)
+        rates[str(confidence)] = {
+            "false_positives": false_positives,
+            "false_negatives": false_negatives,
+            "fp_rate": round(false_positives / negatives, 4) if negatives else None,
+            "fn_rate": round(false_negatives / positives, 4) if positives else None,
+        }
+    return {"positives": positives, "negatives": negatives, "confidence": rates}
+
+
+def benchmark_matcher(report_config, folder, confidences):
+    """
+    Scores every template of the report on every recorded frame.
+    Returns:
+        dict: Frames per second, per-template latency and error rates per confidence.
+    """
+    matcher = TemplateMatcher(metrics=RunMetrics())
+    matcher.load_report(report_config)
+    templates = list(matcher.templates)
+    # A frame captured several times is scored once
+    frames = list(dict.fromkeys(ReplayScreen(folder).frames))
+    latencies = {template: [] for template in templates}
+    scores = {}
+    match_time = 0.0
+    for frame_path in frames:
+        frame = load_frame(frame_path)
+        for template in templates:
+            started = time.perf_counter()
+            scores[(frame_path, template)], _ = matcher.score(template, frame)
+            elapsed = time.perf_counter() - started
+            latencies[template].append(elapsed)
+            match_time += elapsed
+
+    # labels.json keys may name frames that are not in the recording
+    labels = {key: present for key, present in load_labels(folder, templates).items() if key in scores}
+    return {
+        "frames": len(frames),
+        "templates": len(templates),
+        "fps": round(len(frames) / match_time, 2) if match_time else None,
+        "latency_ms": {
+            template: {"mean": round(1000 * sum(values) / len(values), 2), "max": round(1000 * max(values), 2)}
+            for template, values in latencies.items() if values
+        },
+        "labels": error_rates(labels, scores, confidences),
+        "name_labels": error_rates(name_labels(frames, templates), scores, confidences),
+    }
+
+
+def replay_workflow(report_name, config_dir, folder, frame_duration):
+    """
+    Runs the whole AutomationManager workflow of the report against the recording.
+    Returns:
+        dict: Outcome, virtual and real duration, captures and the input that would have been sent.
+    """
+    for name, value in REPLAY_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ.setdefault(f"FILE_NAME_{report_name.upper()}", f"{report_name}_,.csv")
+    screen = ReplayScreen(folder, frame_duration)
+    manager = AutomationManager(report_name, screen=screen, config_dir=config_dir)
+    started = time.perf_counter()
+    result = manager.start()
+    elapsed = time.perf_counter() - started
+    return {
+        "result": result,
+        "steps": [{"name": step["name"], "duration_s": step["duration_s"], "error": step.get("error")}
+                  for step in manager.metrics.steps],
+        "virtual_s": round(screen.clock, 2),
+        "real_s": round(elapsed, 3),
+        "captures": screen.captures,
+        "fps": round(screen.captures / elapsed, 2) if elapsed else None,
+        "recording_finished": screen.finished,
+        "actions": screen.actions,
+    }
+
+
+def print_results(name, matcher_results, workflow_results):
+    print(f"== {name}")
+    if matcher_results:
+        print(f"  matcher: {matcher_results['frames']} frames x {matcher_results['templates']} templates, "
+              f"{matcher_results['fps']} fps")
+        for template, latency in sorted(matcher_results["latency_ms"].items(), key=lambda item: -item[1]["mean"]):
+            print(f"    {latency['mean']:8.2f} ms mean {latency['max']:8.2f} ms max  {template}")
+        for key, title in (("labels", LABELS_FILE), ("name_labels", "screenshot names, the matcher's own decisions")):
+            labels = matcher_results[key]
+            if not labels["positives"] + labels["negatives"]:
+                print(f"    no labels from {title}")
+                continue
+            print(f"    labels from {title}: {labels['positives']} positives, {labels['negatives']} negatives")
+            for confidence, rates in labels["confidence"].items():
+                print(f"      confidence {confidence:<6} FP {rates['false_positives']} ({rates['fp_rate']})"
+                      f"  FN {rates['false_negatives']} ({rates['fn_rate']})")
+    if workflow_results:
+        print(f"  workflow: {workflow_results['result']}")
+        print(f"    {workflow_results['virtual_s']}s replayed in {workflow_results['real_s']}s, "
+              f"{workflow_results['captures']} captures, {workflow_results['fps']} fps, "
+              f"{len(workflow_results['actions'])} actions")
+        for step in workflow_results["steps"]:
+            print(f"    {step['duration_s']:8.3f}s  {step['name']}{'  ' + step['error'] if step['error'] else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays recorded screenshots through the matcher and the report workflows.")
+    parser.add_argument("reports", nargs="*", default=REPORTS)
+    parser.add_argument("--config-dirs", nargs="+", default=CONFIG_DIRS)
+    parser.add_argument("--recordings", default="screenshots", help="Folder holding one recording folder per report")
+    parser.add_argument("--confidences", default=",".join(str(confidence) for confidence in CONFIDENCES))
+    parser.add_argument("--frame-duration", type=float, default=None,
+                        help="Seconds each frame is shown, the recording times are used when not set")
+    parser.add_argument("--no-workflow", action="store_true", help="Only benchmark the matcher")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Keep the replay out of the console and of activity_logs.log
+    extraction.PRINT_MESSAGES = False
+    logging.disable(logging.CRITICAL)
+    # Metrics are read from the manager, the summary is never appended to the stats file
+    os.environ["METRICS_MODE"] = "summary"
+    confidences = [float(confidence) for confidence in args.confidences.split(",")]
+
+    results = {}
+    for config_dir in args.config_dirs:
+        for report_name in args.reports:
+            name = os.path.normpath(os.path.join(os.path.relpath(config_dir, "config"), report_name))
+            if not os.path.isfile(os.path.join(config_dir, f"{report_name}.json")):
+                continue
+            folder = recording_folder(args.recordings, config_dir, report_name)
+            if folder is None:
+                print(f"== {name}: no recording in {args.recordings}, skipped")
+                continue
+            entry = {"recording": folder}
+            try:
+                entry["matcher"] = benchmark_matcher(load_report_config(report_name, config_dir), folder, confidences)
+                if not args.no_workflow:
+                    entry["workflow"] = replay_workflow(report_name, config_dir, folder, args.frame_duration)
+            except Exception as e:
+                # One unreadable frame or template only fails its own entry
+                entry["error"] = f"{type(e).__name__}: {str(e)}"
+                print(f"== {name}: {entry['error']}")
+                continue
+            finally:
+                results[name] = entry
+            print_results(name, entry.get("matcher"), entry.get("workflow"))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+    return 0 if results and not any("error" in entry for entry in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1 @@
-#!/usr/bin/env pythonimport pyautoguiimport subprocessimport osimport sysimport timeimport jsonimport loggingfrom datetime import datetime, timedelta from dotenv import load_dotenv# ConstantsLIMIT = 5MAX_LIMIT = 50MIN_SLEEP_TIME = 5MAX_SLEEP_TIME = 20# DEV Constants#LIMIT = 5#MAX_LIMIT = 5#MIN_SLEEP_TIME = 3#MAX_SLEEP_TIME = 10#10CONFIDENCE = 0.5SCREENSHOTS = TruePRINT_MESSAGES  = TrueINFO="info"WARNING="warning"ERROR="error"START="_beginning"END="_final"# Reports that extract the prev month by defaulfPREV_MONTH_REPORTS = ["ic01","accruals"]# Logslogging.basicConfig(filename='activity_logs.log', level=logging.INFO, format='%(asctime)s - %(levelname)s \t- %(message)s')# Load environment variables from .env fileload_dotenv()def log_message(message, level=INFO):    """    Generic log function to handle info, warning, and error levels.    It logs to both the console and a log file.    Args:        message (str): The message to log.        level (str): The log level - "info", "warning", "error". Default is "info".    """    current_time = datetime.now().strftime("%H:%M:%S")  # Get current time in HH:MM:SS format        # Print message to console    if PRINT_MESSAGES:        if level == INFO:            print(f"{current_time} - INFO: {message}")        elif level == WARNING:            print(f"{current_time} - WARNING: {message}")        elif level == ERROR:            print(f"{current_time} - ERROR: {message}")        # Log to file    if level == INFO:        logging.info(message)    elif level == WARNING:        logging.warning(message)    elif level == ERROR:        logging.error(message)def load_report_config(report_name):    """    Loads the report configuration from a JSON file.    Args:        report_name (str): The name of the report.    Returns:        dict: The report configuration dictionary.    """    config_path = os.path.join("config", f"{report_name}.json")    with open(config_path, "r") as f:        return json.load(f)  # Assuming you have the `json` library installedclass AutomationManager:    def __init__(self, report_name, date=None):        self.browser_instance = None        self.steps = []        self.report_name = report_name        self.date = date        self.report_config = load_report_config(report_name)        self.actions = {                "perform_login": self.perform_login,                "perform_select_responsabilite": self.perform_select_responsabilite,                "perform_accept_optional": self.perform_accept_optional,                "perform_browse": self.perform_browse,                "perform_select_periode": self.perform_select_periode,                "perform_wait": self.perform_wait,                "perform_long_wait": self.perform_long_wait,                "perform_wait_large_query": self.perform_wait_large_query,                "perform_wait_large_query_duk008": self.perform_wait_large_query_duk008,                "perform_extract": self.perform_extract,                "perform_extract_ic01": self.perform_extract_ic01,                "perform_download": self.perform_download,                "perform_conditions":self.perform_conditions,            }        self.load_steps()    def load_steps(self):        # Load steps configuration        for step_name, step_details in self.report_config.items():            images = step_details.get('images')            action = step_details.get('action')            self.steps.append(Step(report_name, step_name, images, action))    def start(self, browser="FIREFOX"):          try:               self.browser_instance = self.open_browser(browser)               for step in self.steps:                   log_message(f"Step {str(step.name)}", INFO)                   log_message(f"Visual elements used on this step:\t {str(step.images)}", INFO)                   try:                       step.execute(self)                   except FileNotFoundError as e:                       error_message = f"Step '{step.name}' failed: Target image not detected on the screen - {str(e)}"                       log_message(error_message, ERROR)                       return error_message  # Return the error message with step name                   except Exception as e:                       error_message = f"Step '{step.name}' failed with an error: {str(e)}"                       log_message(error_message, ERROR)                       return error_message  # Return the error message with step name               self.close_browser()               log_message("\tSuccess", INFO)               return "Success"  # Indicate success with a message          except FileNotFoundError as e:               error_message = f"Failed due to image detection issue: {str(e)}"               log_message(error_message, ERROR)               return error_message  # Return the detailed error message          except Exception as e:               error_message = f"Main Error: {str(e)}"               log_message(error_message, ERROR)               return error_message  # Return the detailed error message    def open_browser(self, browser):        url = os.environ.get("URL")        browser_path = os.environ.get(browser + "_PATH")        profile_path = os.environ.get(browser.upper() + "_PROFILE_PATH")  # optional                if url is None or browser_path is None or profile_path is None:            raise ValueError(f"URL or {browser}_PATH environment variable is not set")                cmd = [browser_path]                if profile_path:            cmd += ["--profile", profile_path]                cmd.append(url)        cmd_message = f"FIREFOX COMMAND - {str(cmd)}"        log_message(cmd_message, INFO)        process = subprocess.Popen(cmd)                # Maximize the window using xdotool        subprocess.call(["xdotool", "search", "--onlyvisible", "--class", "Firefox", "windowmaximize"])        return process    def close_browser(self):        if self.browser_instance:            self.browser_instance.terminate()            log_message("Browser closed.", INFO)        log_message("Finished.", INFO)    def perform_conditions(self, step_name, images):        log_message("Performing Conditions", INFO)        try:            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)                        x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            pyautogui.doubleClick(x, y)            time.sleep(MIN_SLEEP_TIME)                        pyautogui.press('tab')            time.sleep(MIN_SLEEP_TIME)            pyautogui.press('tab')            time.sleep(MIN_SLEEP_TIME)            pyautogui.press('tab')            time.sleep(MIN_SLEEP_TIME)            pyautogui.press('tab')            time.sleep(MIN_SLEEP_TIME)            date_str = str(self.get_date_prev_month(step_name, self.date))            formatted_date = f"'{date_str.upper()}'"            pyautogui.press(list(formatted_date))            time.sleep(MIN_SLEEP_TIME)                        StepExecutor.take_screenshot(step_name+"_dev",report_name=self.report_name)            pyautogui.press('enter')            time.sleep(MIN_SLEEP_TIME)            time.sleep(MIN_SLEEP_TIME)                        #Yes Large query            position = StepExecutor.check_image_exists(images[2],report_name=self.report_name)            if position:                        x, y = position                        pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)        except Exception as e:            log_message(f"Error in login step: {str(e)}", WARNING)            #return f"FAIL_STEP: {step_name}"            raise        def perform_login(self, step_name, images):        log_message("Performing login", INFO)        username = os.environ.get("USERNAME")        password = os.environ.get("PASSWORD")        database = os.environ.get("DATABASE")        try:            #Connect to            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"_1",report_name=self.report_name)            pyautogui.click(x + 75, y)            pyautogui.press('down')            pyautogui.press('enter')            time.sleep(MIN_SLEEP_TIME)            #Oracle Applications            #x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            #StepExecutor.take_screenshot(step_name+"_2",report_name=self.report_name)            #pyautogui.click(x, y)            #time.sleep(MIN_SLEEP_TIME)                        #Username            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"_3",report_name=self.report_name)            pyautogui.click(x + 100, y)            time.sleep(MIN_SLEEP_TIME)            pyautogui.press(list(username))            time.sleep(MIN_SLEEP_TIME)                        pyautogui.press('tab')            pyautogui.press(list(password))            StepExecutor.take_screenshot(step_name+"_4",report_name=self.report_name)                        pyautogui.press('tab')            pyautogui.press(list(database))            StepExecutor.take_screenshot(step_name+"_5",report_name=self.report_name)            pyautogui.press('enter')        except Exception as e:            log_message(f"Error in login step: {str(e)}", WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def perform_select_responsabilite(self, step_name, images):        log_message("Performing select_responsabilite", INFO)        try:            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            pyautogui.press(['down', 'down'])            time.sleep(MIN_SLEEP_TIME)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)            pyautogui.press(['enter'])            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            pyautogui.click(x, y)        except Exception as e:            log_message(f"Error in select_responsabilite step: {str(e)}", WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def perform_accept_optional(self, step_name, images):        log_message("Performing accept_optional", INFO)        try:            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)            pyautogui.click(x, y)        except Exception as e:            log_message(f"Error in accept_optional step: {str(e)}", WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def perform_browse(self, step_name, images):        log_message("Performing browse", INFO)        try:            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            pyautogui.click(x, y)            pyautogui.press(['down', 'enter'])                        StepExecutor.take_screenshot(step_name,report_name=self.report_name)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            pyautogui.click(x, y)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)            pyautogui.press('enter')                    except Exception as e:            log_message(f'Error in browse step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def perform_select_periode(self, step_name, images):        log_message("Performing select periode", INFO)        try:            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            pyautogui.click(x + 200, y)            time.sleep(MIN_SLEEP_TIME)            pyautogui.press(list(self.get_date_prev_month(step_name,self.date)))            time.sleep(MIN_SLEEP_TIME)            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            pyautogui.press('enter')                        time.sleep(MIN_SLEEP_TIME)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)        except Exception as e:            log_message(f'Error in login step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise        def perform_wait(self, step_name, images):        log_message("Performing wait", INFO)        try:            StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            StepExecutor.wait_for_image_to_disappear(images[0],report_name=self.report_name)        except Exception as e:            log_message(f'Error in wait step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise                def perform_long_wait(self, step_name, images):        log_message("Performing wait", INFO)        try:            time.sleep(MAX_SLEEP_TIME)            StepExecutor.long_wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            time.sleep(MIN_SLEEP_TIME)                    except Exception as e:            log_message(f'Error in wait step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise                def perform_wait_large_query(self, step_name, images):        log_message("Performing wait", INFO)        try:            time.sleep(MIN_SLEEP_TIME)            #Yes Large query            position = StepExecutor.check_image_exists(images[1],report_name=self.report_name)            if position:                x, y = position                pyautogui.click(x, y)                time.sleep(MIN_SLEEP_TIME)                        StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            #StepExecutor.take_screenshot(step_name+"2",report_name=self.report_name)            StepExecutor.wait_for_image_to_disappear(images[0],report_name=self.report_name)        except Exception as e:            log_message(f'Error in wait step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise        def perform_wait_large_query_duk008(self, step_name, images):        log_message("Performing wait", INFO)        try:            time.sleep(MIN_SLEEP_TIME)            #Yes Large query            #position = StepExecutor.check_image_exists(images[1],report_name=self.report_name)            #if position:            #   x, y = position            #   pyautogui.click(x, y)            #   time.sleep(MIN_SLEEP_TIME)            StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            #StepExecutor.take_screenshot(step_name+"2",report_name=self.report_name)            StepExecutor.wait_for_image_to_disappear(images[0],report_name=self.report_name)        except Exception as e:            log_message(f'Error in wait step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise                def perform_extract(self, step_name, images):        log_message("Performing extract", INFO)        try:            time.sleep(MAX_SLEEP_TIME)            x, y = StepExecutor.long_wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"2",report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            destination_folder_path = os.environ.get("LOCAL_DESTINATION_FOLDER_PATH")            file_name = self.get_file_name(step_name,self.date)            destination = os.path.join(destination_folder_path, file_name)            x, y = StepExecutor.wait_for_image(images[3],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"3",report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            pyautogui.write(destination, interval=0.25)            StepExecutor.take_screenshot(step_name+"4",report_name=self.report_name)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[4],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"5",report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            position = StepExecutor.check_image_exists(images[5],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"6",report_name=self.report_name)            if position:                x, y = position                pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[6],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"7",report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            position = StepExecutor.check_image_exists(images[5],report_name=self.report_name)            if position:                x, y = position                pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)        except Exception as e:            log_message(f'Error in extract step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise        def perform_extract_ic01(self, step_name, images):        log_message("Performing extract", INFO)        try:            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            destination_folder_path = os.environ.get("LOCAL_DESTINATION_FOLDER_PATH")            file_name = self.get_file_name(step_name,self.date)            destination = os.path.join(destination_folder_path, file_name)            x, y = StepExecutor.wait_for_image(images[3],report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            pyautogui.write(destination, interval=0.25)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[4],report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            #YES            position = StepExecutor.check_image_exists(images[5],report_name=self.report_name)            if position:                x, y = position                pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)                        x, y = StepExecutor.wait_for_image(images[6],report_name=self.report_name)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            position = StepExecutor.check_image_exists(images[5],report_name=self.report_name)            if position:                x, y = position                pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)        except Exception as e:            log_message(f'Error in extract step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def perform_download(self, step_name, images):        log_message("Performing download", INFO)        try:            time.sleep(MIN_SLEEP_TIME)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            time.sleep(MIN_SLEEP_TIME)            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)            pyautogui.click(x, y)            time.sleep(MIN_SLEEP_TIME)            time.sleep(MIN_SLEEP_TIME)            pyautogui.hotkey('alt', 'f4')            time.sleep(MIN_SLEEP_TIME)            pyautogui.hotkey('alt', 'f4')        except Exception as e:            log_message(f'Error in download step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def get_date_prev_month(self, step_name, date=None):        # Load the report configuration        report_config = load_report_config(self.report_name)        # Get the specific date format for the given report name from the config        date_format = report_config.get(step_name).get("date_format", "%b-%y")  # Default to "%y-%m-%d" if not specified        if not date:            # Calculate the date for the previous month            today = datetime.now()            # Create a timedelta object representing one month            one_month_ago = timedelta(days=31)  # Adjust for days in different months if needed            # Subtract one month from the current date            date = today - one_month_ago        # Format the previous month's date        previous_month_str = date.strftime(date_format).upper()        log_message(f"\tPeriode\t:\t{previous_month_str}", INFO)        return f"{previous_month_str}"        def get_file_name(self, step_name, date=None):        # Load the report configuration        report_config = load_report_config(self.report_name)        # Get the file name components from the environment variable        var_env_file_name = f"FILE_NAME_{self.report_name.upper()}"        file_name_str = os.environ.get(var_env_file_name)        if not file_name_str:            raise ValueError(f"Environment variable {var_env_file_name} is not set")        # Get the specific date format for the given report name from the config        date_format = report_config.get(step_name).get("date_format", "%y-%m-%d")  # Default to "%y-%m-%d" if not specified                if not date:            # Calculate the current date in the desired format            date = datetime.now()            if self.report_name in PREV_MONTH_REPORTS:                # Calculate the date for the previous month                today = datetime.now()                # Create a timedelta object representing one month                one_month_ago = timedelta(days=31)  # Adjust for days in different months if needed                # Subtract one month from the current date                date = today - one_month_ago        date = date.strftime(date_format)        # Split the file name components        file_name_lst = file_name_str.split(",")        # Construct the final file name        file_name = f"{file_name_lst[0]}{date}{file_name_lst[1]}"        log_message(f"\t\tFile-{file_name}", INFO)        return f"{self.report_name}/{file_name}"        #return file_nameclass Step:    def __init__(self, report_name, name, images, action):        self.report_name = report_name        self.name = name        self.images = images        self.action = action    def execute(self, manager):        #StepExecutor.wait_for_image(self.images[0], report_name = self.report_name)        action_method = manager.actions.get(self.action)        if action_method:            # Execute the action method and check for failures            action_method(self.name, self.images)            #if isinstance(result, str) and result.startswith("FAIL_STEP"):            #    return result  # Return the failure step if it fails        else:            raise ValueError(f"Action {self.action} not found for step {self.name}")class StepExecutor:    @staticmethod    def take_screenshot(step,report_name=""):        if SCREENSHOTS:            screenshot = pyautogui.screenshot()            folder_path="/"            if report_name:                folder_path="/"+str(report_name)+"/"            screenshot_path = f"screenshots{folder_path}{step}.bmp"            screenshot.save(screenshot_path)            last_screenshot_path = f"screenshots{folder_path}00_last_state.bmp"            screenshot.save(last_screenshot_path)            log_message(f"\tScreenshot {step}", INFO)    @staticmethod    def wait_for_image(image_file, report_name="", initial_sleep=MIN_SLEEP_TIME):        log_message("\tInitiating image recognition on screen...", INFO)        isUIfound = False        patience = 0        time.sleep(initial_sleep)        log_message(f"\t\tScanning for visual element \t: {image_file}", INFO)        image_name = os.path.splitext(os.path.basename(image_file))[0]        while not isUIfound and patience < LIMIT:            try:                #time.sleep(MAX_SLEEP_TIME)                elemUI = pyautogui.locateCenterOnScreen(image_file, grayscale=True)                if elemUI is not None:                    log_message(f"\t\tVisual element identified \t\t: {image_file}", INFO)                    return elemUI            except Exception as e:                                log_message(f"\tIssue identifying visual element : {image_file}: {str(e)}", WARNING)                StepExecutor.take_screenshot(image_name+"_searching", report_name=report_name)            patience += 1            log_message(f"\tMy patience: {str(patience)}", WARNING)            time.sleep(MAX_SLEEP_TIME)        log_message(f"\t\tUnable to identify visual element after {LIMIT} attempts \t\t: {image_file}", ERROR)        StepExecutor.take_screenshot(image_name+"_notfound", report_name=report_name)        raise FileNotFoundError(f"Image recognition failed - {image_file}")    @staticmethod    def long_wait_for_image(image_file, report_name="", initial_sleep=MIN_SLEEP_TIME):        log_message("\tInitiating image recognition on screen...", INFO)        isUIfound = False        patience = 0        time.sleep(initial_sleep)        log_message(f"\t\tScanning for visual element \t: {image_file}", INFO)        image_name = os.path.splitext(os.path.basename(image_file))[0]        while not isUIfound and patience < MAX_LIMIT:            try:                #time.sleep(MAX_SLEEP_TIME)                elemUI = pyautogui.locateCenterOnScreen(image_file, grayscale=True)                if elemUI is not None:                    log_message(f"\t\tVisual element identified \t\t: {image_file}", INFO)                    return elemUI            except Exception as e:                                log_message(f"\tIssue identifying visual element : {image_file}: {str(e)}", WARNING)                StepExecutor.take_screenshot(image_name+"_searching", report_name=report_name)            patience += 1            log_message(f"\tMy patience: {str(patience)}/{str(MAX_LIMIT)}", WARNING)            time.sleep(MAX_SLEEP_TIME)        log_message(f"\t\tUnable to identify visual element after {MAX_LIMIT} attempts \t\t: {image_file}", ERROR)        StepExecutor.take_screenshot(image_name+"_notfound", report_name=report_name)        raise FileNotFoundError(f"Image recognition failed - {image_file}")    @staticmethod    def wait_for_image_to_disappear(image_file, report_name="", initial_sleep=0):        finalFlag=5        isUIfound = True        patience = 0        log_message(f"\tMonitoring for visual element to disappear: {image_file}", INFO)        image_name = os.path.splitext(os.path.basename(image_file))[0]        while isUIfound and patience < finalFlag:            try:                elemUI = pyautogui.locateCenterOnScreen(image_file, grayscale=True)                if elemUI is None:                    log_message(f"\t\tVisual element disappeared \t: {image_file}", INFO)                    StepExecutor.take_screenshot(image_name+"_disappeared", report_name=report_name)                    return                else:                    pyautogui.click(elemUI) #prevent inactivity                    StepExecutor.take_screenshot(image_name+"_current_status", report_name=report_name)            except Exception as e:                log_message(f"\tCycle {patience+1}/{finalFlag}: Awaiting visual element disappearance: {image_file}", INFO)                patience += 1            time.sleep(MIN_SLEEP_TIME)        @staticmethod    def check_image_exists(image_file, report_name="", initial_sleep=5):        """        Checks if an image exists on the screen.        Args:            image_file (str): Path to the image file.            confidence (float, optional): Confidence level for image matching. Defaults to 0.9.        Returns:            tuple: Coordinates of the image center if found, None otherwise.        """        log_message("\tInitiating image recognition on screen...", INFO)        time.sleep(initial_sleep)        log_message(f"\t\tScanning for visual element \t: {image_file}", INFO)        image_name = os.path.splitext(os.path.basename(image_file))[0]        try:            elemUI = pyautogui.locateCenterOnScreen(image_file, grayscale=True)            if elemUI is not None:                log_message(f"\t\tVisual element identified \t\t: {image_file}", INFO)                StepExecutor.take_screenshot(image_name+"_check_found", report_name=report_name)                return elemUI        except Exception as e:            log_message(f"\tIssue identifying visual element : {image_file}: {str(e)}", WARNING)            StepExecutor.take_screenshot(image_name+"_check_notfound", report_name=report_name)        log_message(f"Visual element not detected: {image_file}", WARNING)        return Noneif __name__ == "__main__":    report_name = sys.argv[1] if len(sys.argv) > 1 else "duk008"    config_path = os.path.join("config", f"{report_name}.json")        # Check if the configuration file exists    if not os.path.isfile(config_path):        error_message = f"Process for report '{report_name}' is not allowed or does not exist."        log_message(error_message, ERROR)        sys.exit(error_message)  # Exit with the error message    log_message(f"Loading configuration file : {config_path}", INFO)        # Handle date argument for specific reports    if report_name.lower() in PREV_MONTH_REPORTS:        date = sys.argv[2] if len(sys.argv) > 2 else None        if date:            date = datetime.strptime(date, "%Y-%m-%d").date()    else:        if len(sys.argv) > 2:            log_message("Warning: Date argument is ignored for this report.", WARNING)        date = None        periode_str = f"- periode : {date}" if date is not None else ''    log_message(f"Start extraction for report: {report_name} {periode_str}", INFO)    # Initialize AutomationManager and start the process    manager = AutomationManager(report_name, date=date)    result = manager.start()    # Log and return either "Success" or the error message    if result == "Success":        log_message(f"Extraction Result - {result}", INFO)        sys.exit(0)  # Exit with success    else:        log_message(f"Extraction Failed - {result}", ERROR)        sys.exit(result)  # Exit with the error message
\ No newline at end of file
+#!/usr/bin/env pythonimport subprocessimport osimport sysimport timeimport jsonimport loggingimport queueimport threadingimport zlibimport uuidimport bisectimport hashlibimport signalimport selectimport structimport ctypesimport ctypes.utilimport numpy as npimport cv2from collections import namedtuplefrom contextlib import contextmanagerfrom datetime import datetime, timedelta from dotenv import load_dotenvfrom PIL import Imagetry:    import pyautoguiexcept Exception:    # No display to connect to, only the replay screen can be used    pyautogui = None# ConstantsLIMIT = 5MAX_LIMIT = 50MIN_SLEEP_TIME = 5MAX_SLEEP_TIME = 20# DEV Constants#LIMIT = 5#MAX_LIMIT = 5#MIN_SLEEP_TIME = 3#MAX_SLEEP_TIME = 10#10CONFIDENCE = 0.5# Same threshold pyscreeze applies when no confidence is givenMATCH_CONFIDENCE = 0.999# Adaptive waitingPOLL_INTERVAL = 0.25        # Delay between captures right after a screen changeMAX_POLL_INTERVAL = 4       # Backoff ceiling while the screen stays stillSETTLE_TIME = 1             # Seconds without change for the screen to be settledTHUMBNAIL_STEP = 8          # Downscale factor of the frames compared for changesCHANGED_PIXEL_DELTA = 16    # Grey level difference for a thumbnail pixel to count as changedCHANGED_PIXELS_RATIO = 0.001# Per-step budgets in seconds, overridden by "timeouts" in the report JSONDEFAULT_TIMEOUTS = {    "wait": LIMIT * MAX_SLEEP_TIME,    "long_wait": MAX_LIMIT * MAX_SLEEP_TIME,    "check": MIN_SLEEP_TIME,    "settle": MIN_SLEEP_TIME,    "disappear": None,    "disappear_confirm": 5 * MIN_SLEEP_TIME,   # The old loop needed 5 misses 5s apart    "popup": 3 * MIN_SLEEP_TIME,    "download": MAX_LIMIT * MAX_SLEEP_TIME,}SCREENSHOTS = TrueSCREENSHOTS_PATH = "screenshots"SCREENSHOT_FORMAT = "png"SCREENSHOT_QUEUE_SIZE = 16# One {"file", "time"} line per capture, rewritten by each run, read back by ReplayScreenSCREENSHOT_INDEX = "00_index.jsonl"PRINT_MESSAGES  = True# Replay: extensions of the recorded frames and file names that are not framesREPLAY_EXTENSIONS = (".png", ".bmp")REPLAY_SKIPPED = ("00_last_state",)# Calibration: templates are drawn for BASE_DISPLAY (width, height, dpi), other displays# use copies rescaled to their UI scale from TEMPLATE_CACHE_PATH. A display missing from the# calibration file is calibrated on the first anchor it shows, see also template_calibration.pyBASE_DISPLAY = (1892, 880, 96)TEMPLATE_CACHE_PATH = "template_cache"CALIBRATION_FILE = "calibration.json"CALIBRATION_ANCHORS = ["images/generic/1_en_1_connect_to.bmp", "images/generic/4_en_browse.bmp"]CALIBRATION_SCALES = (0.5, 2.0, 0.1)    # Coarse search: first, last, stepCALIBRATION_FINE_STEP = 0.01            # Fine search around the best coarse scaleCALIBRATION_CONFIDENCE = 0.9CALIBRATION_POLL_INTERVAL = 5TEMPLATE_EXTENSIONS = (".bmp", ".png")# Warm sessions: with SESSION_POOL=true in .env the browser stays logged in between jobsSESSION_POOL = FalseSESSION_PATH = "sessions"SESSION_CHECK_IMAGE = "images/generic/4_en_browse.bmp"   # Workbook browser of a ready sessionSESSION_END_ACTION = "perform_browse"                    # Steps before the first one set up the sessionSESSION_MAX_AGE = 8 * 3600SESSION_RETURN_ATTEMPTS = 3SESSION_CLOSE_TIMEOUT = 15                               # Seconds for the browser to exit before SIGKILLSESSION_RETURN_HOTKEY = ("ctrl", "o")                    # Discoverer File > Open# Downloads: an export is complete once closed by its writer and its size stable, see DownloadWatcherDOWNLOAD_STABLE_TIME = 2DOWNLOAD_POLL_INTERVAL = 0.5DOWNLOAD_CHUNK_SIZE = 1024 * 1024MANIFEST_SUFFIX = ".manifest.json"ROW_COUNT_EXTENSIONS = (".csv", ".txt")INOTIFY_MODIFY = 0x002INOTIFY_CLOSE_WRITE = 0x008INOTIFY_MOVED_TO = 0x080INOTIFY_CREATE = 0x100INOTIFY_MASK = INOTIFY_MODIFY | INOTIFY_CLOSE_WRITE | INOTIFY_MOVED_TO | INOTIFY_CREATEINOTIFY_EVENT = struct.Struct("iIII")# Run metrics: "off", "summary" (one line per run) or "full" (plus every span), METRICS_MODE in .envMETRICS_MODE = "summary"METRICS_PATH = "stats"METRICS_SUMMARY_FILE = "report_stats.jsonl"INFO="info"WARNING="warning"ERROR="error"START="_beginning"END="_final"# Reports that extract the prev month by defaulfPREV_MONTH_REPORTS = ["ic01","accruals"]# Logslogging.basicConfig(filename='activity_logs.log', level=logging.INFO, format='%(asctime)s - %(levelname)s \t- %(message)s')# Load environment variables from .env fileload_dotenv()def log_message(message, level=INFO):    """    Generic log function to handle info, warning, and error levels.    It logs to both the console and a log file.    Args:        message (str): The message to log.        level (str): The log level - "info", "warning", "error". Default is "info".    """    current_time = datetime.now().strftime("%H:%M:%S")  # Get current time in HH:MM:SS format        # Print message to console    if PRINT_MESSAGES:        if level == INFO:            print(f"{current_time} - INFO: {message}")        elif level == WARNING:            print(f"{current_time} - WARNING: {message}")        elif level == ERROR:            print(f"{current_time} - ERROR: {message}")        # Log to file    if level == INFO:        logging.info(message)    elif level == WARNING:        logging.warning(message)    elif level == ERROR:        logging.error(message)def load_report_config(report_name, config_dir="config"):    """    Loads the report configuration from a JSON file.    Args:        report_name (str): The name of the report.        config_dir (str, optional): Folder of the configuration, e.g. config/DHJQ1436.    Returns:        dict: The report configuration dictionary.    """    config_path = os.path.join(config_dir, f"{report_name}.json")    with open(config_path, "r") as f:        return json.load(f)  # Assuming you have the `json` library installedclass AutomationManager:    def __init__(self, report_name, date=None, screen=None, config_dir="config", metrics=None):        self.browser_instance = None        self.steps = []        self.report_name = report_name        self.date = date        self.screen = screen or LiveScreen()        self.report_config = load_report_config(report_name, config_dir)        self.metrics = metrics or RunMetrics(report_name)        session_pool = os.environ.get("SESSION_POOL", str(SESSION_POOL)).lower() == "true"        self.session = BrowserSession() if session_pool and self.screen.live else None        self.download = None        self.actions = {                "perform_login": self.perform_login,                "perform_select_responsabilite": self.perform_select_responsabilite,                "perform_accept_optional": self.perform_accept_optional,                "perform_browse": self.perform_browse,                "perform_select_periode": self.perform_select_periode,                "perform_wait": self.perform_wait,                "perform_long_wait": self.perform_long_wait,                "perform_wait_large_query": self.perform_wait_large_query,                "perform_wait_large_query_duk008": self.perform_wait_large_query_duk008,                "perform_extract": self.perform_extract,                "perform_extract_ic01": self.perform_extract_ic01,                "perform_download": self.perform_download,                "perform_conditions":self.perform_conditions,            }        self.load_steps()    def load_steps(self):        # Load steps configuration        for step_name, step_details in self.report_config.items():            images = step_details.get('images')            action = step_details.get('action')            timeouts = step_details.get('timeouts', {})            self.steps.append(Step(self.report_name, step_name, images, action, timeouts))        # Login, responsabilite and applet load: everything before the first workbook browse        self.session_steps = next((index for index, step in enumerate(self.steps) if step.action == SESSION_END_ACTION), 0)        session_config = [self.report_config[step.name] for step in self.steps[:self.session_steps]]        self.session_signature = hashlib.sha256(json.dumps(session_config, sort_keys=True).encode()).hexdigest()    def load_templates(self):        # Decode every template of the report once, before the browser is opened        StepExecutor.metrics = self.metrics        StepExecutor.screen = self.screen        StepExecutor.matcher = TemplateMatcher(metrics=self.metrics, screen=self.screen,                                               cache=display_template_cache(self.screen))        StepExecutor.matcher.load_report(self.report_config)        StepExecutor.watcher = ScreenWatcher(StepExecutor.matcher)        log_message(f"Templates loaded: {len(StepExecutor.matcher.templates)}", INFO)    def start(self, browser="FIREFOX"):          try:               self.load_templates()               steps = self.steps               if self.resume_session():                   steps = self.steps[self.session_steps:]               elif self.screen.live:                   self.browser_instance = self.open_browser(browser)               if self.screen.live:                   self.calibrate_display()               for step in steps:                   log_message(f"Step {str(step.name)}", INFO)                   log_message(f"Visual elements used on this step:\t {str(step.images)}", INFO)                   try:                       step.execute(self)                   except FileNotFoundError as e:                       error_message = f"Step '{step.name}' failed: Target image not detected on the screen - {str(e)}"                       log_message(error_message, ERROR)                       self.end_session()                       return error_message  # Return the error message with step name                   except Exception as e:                       error_message = f"Step '{step.name}' failed with an error: {str(e)}"                       log_message(error_message, ERROR)                       self.end_session()                       return error_message  # Return the error message with step name               if self.session is not None:                   self.keep_session()               else:                   self.close_browser()               log_message("\tSuccess", INFO)               return "Success"  # Indicate success with a message          except FileNotFoundError as e:               error_message = f"Failed due to image detection issue: {str(e)}"               log_message(error_message, ERROR)               self.end_session()               return error_message  # Return the detailed error message          except Exception as e:               error_message = f"Main Error: {str(e)}"               log_message(error_message, ERROR)               self.end_session()               return error_message  # Return the detailed error message          finally:               if self.download is not None:                   self.download.stop()               StepExecutor.flush_screenshots()    def calibrate_display(self):        # A display neither calibrated nor BASE_DISPLAY is calibrated on the login page        key = uncalibrated_display(self.screen)        if key is None:            return        log_message(f"Display {key} is not calibrated, looking for a calibration anchor", INFO)        with self.metrics.span("calibration", key) as span:            result = detect_scale(self.screen, CALIBRATION_ANCHORS, StepExecutor.timeout("long_wait"))            if result is None:                raise FileNotFoundError(f"No calibration anchor recognised on display {key} - {CALIBRATION_ANCHORS}")            scale, score = result            span["scale"] = scale            save_calibration(key, scale, score, CALIBRATION_ANCHORS)            if abs(scale - 1) >= CALIBRATION_FINE_STEP / 2:                count = TemplateCache(key, scale).precompute()                log_message(f"Display {key} calibrated at scale {scale:.2f}, {count} templates cached", INFO)        self.load_templates()    def open_browser(self, browser):        url = os.environ.get("URL")        browser_path = os.environ.get(browser + "_PATH")        profile_path = os.environ.get(browser.upper() + "_PROFILE_PATH")  # optional                if url is None or browser_path is None or profile_path is None:            raise ValueError(f"URL or {browser}_PATH environment variable is not set")                cmd = [browser_path]                if profile_path:            # -no-remote keeps instances on other displays from taking over the URL            cmd += ["--profile", profile_path, "-no-remote"]                cmd.append(url)        cmd_message = f"FIREFOX COMMAND - {str(cmd)}"        log_message(cmd_message, INFO)        if self.session is not None:            # A pooled browser gets its own process group and output to outlive this run,            # trigger_report_extraction.sh waits for the output of the run to be closed            process = subprocess.Popen(cmd, start_new_session=True, stdin=subprocess.DEVNULL,                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)            self.session.save(pid=process.pid, profile=profile_path, display=os.environ.get("DISPLAY"),                              signature=self.session_signature, started_at=time.time(), jobs=0, ready=False)        else:            process = subprocess.Popen(cmd)                # Maximize the window using xdotool        subprocess.call(["xdotool", "search", "--onlyvisible", "--class", "Firefox", "windowmaximize"])        return process    def close_browser(self):        if self.browser_instance:            self.browser_instance.terminate()            log_message("Browser closed.", INFO)        log_message("Finished.", INFO)    def resume_session(self):        """        Looks for a warm session on this display: the browser is still running, went through        the same session steps, is not too old and shows the workbook browser. Any other        session is closed so the run starts cold.        Returns:            bool: True if the session steps can be skipped.        """        if self.session is None or self.session.load() is None:            return False        info = self.session.info        if not info.get("ready"):            reason = "not ready"        elif not self.session.alive():            reason = "browser not running"        elif info.get("signature") != self.session_signature:            reason = "different session steps"        elif time.time() - info.get("started_at", 0) > SESSION_MAX_AGE:            reason = "too old"        else:            StepExecutor.timeouts = dict(DEFAULT_TIMEOUTS)            if StepExecutor.check_image_exists(SESSION_CHECK_IMAGE, report_name=self.report_name):                log_message(f"Warm session {info['pid']} reused, {info.get('jobs', 0)} jobs served.", INFO)                return True            reason = "workbook browser not on screen"        log_message(f"Browser session not reused ({reason}), cold start.", WARNING)        self.session.terminate()        return False    def keep_session(self):        """        Brings the browser back to the workbook browser for the next job, or closes        the session when it cannot get there.        """        for attempt in range(SESSION_RETURN_ATTEMPTS):            if StepExecutor.check_image_exists(SESSION_CHECK_IMAGE, report_name=self.report_name):                self.session.save(ready=True, jobs=self.session.info.get("jobs", 0) + 1, last_used_at=time.time())                log_message("Browser session kept for the next job.", INFO)                return            self.screen.press('escape')            StepExecutor.wait_for_screen_to_settle()            self.screen.hotkey(*SESSION_RETURN_HOTKEY)            StepExecutor.wait_for_screen_to_settle()        log_message("Workbook browser not reached, browser session closed.", WARNING)        self.end_session()    def end_session(self):        # After a failure the state of the browser is unknown, the next job starts cold        if self.session is not None:            self.session.terminate()    def perform_conditions(self, step_name, images):        log_message("Performing Conditions", INFO)        try:            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()                        x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            self.screen.doubleClick(x, y)            StepExecutor.wait_for_screen_to_settle()                        self.screen.press('tab')            StepExecutor.wait_for_screen_to_settle()            self.screen.press('tab')            StepExecutor.wait_for_screen_to_settle()            self.screen.press('tab')            StepExecutor.wait_for_screen_to_settle()            self.screen.press('tab')            StepExecutor.wait_for_screen_to_settle()            date_str = str(self.get_date_prev_month(step_name, self.date))            formatted_date = f"'{date_str.upper()}'"            self.screen.press(list(formatted_date))            StepExecutor.wait_for_screen_to_settle()                        StepExecutor.take_screenshot(step_name+"_dev",report_name=self.report_name)            self.screen.press('enter')            StepExecutor.wait_for_screen_to_settle()                        #Yes Large query, or any further image of the step showing the query runs without it            try:                image_file, position = StepExecutor.wait_for_any_image(images[2:],report_name=self.report_name,timeout=StepExecutor.timeout("popup"))                if image_file == images[2]:                    x, y = position                    self.screen.click(x, y)            except FileNotFoundError:                log_message("\tNo large query popup", INFO)            StepExecutor.wait_for_screen_to_settle()            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)        except Exception as e:            log_message(f"Error in login step: {str(e)}", WARNING)            #return f"FAIL_STEP: {step_name}"            raise        def perform_login(self, step_name, images):        log_message("Performing login", INFO)        username = os.environ.get("USERNAME")        password = os.environ.get("PASSWORD")        database = os.environ.get("DATABASE")        try:            #Connect to            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"_1",report_name=self.report_name)            self.screen.click(x + 75, y)            self.screen.press('down')            self.screen.press('enter')            StepExecutor.wait_for_screen_to_settle()            #Oracle Applications            #x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            #StepExecutor.take_screenshot(step_name+"_2",report_name=self.report_name)            #pyautogui.click(x, y)            #time.sleep(MIN_SLEEP_TIME)                        #Username            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"_3",report_name=self.report_name)            self.screen.click(x + 100, y)            StepExecutor.wait_for_screen_to_settle()            self.screen.press(list(username))            StepExecutor.wait_for_screen_to_settle()                        self.screen.press('tab')            self.screen.press(list(password))            StepExecutor.take_screenshot(step_name+"_4",report_name=self.report_name)                        self.screen.press('tab')            self.screen.press(list(database))            StepExecutor.take_screenshot(step_name+"_5",report_name=self.report_name)            self.screen.press('enter')        except Exception as e:            log_message(f"Error in login step: {str(e)}", WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def perform_select_responsabilite(self, step_name, images):        log_message("Performing select_responsabilite", INFO)        try:            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            self.screen.press(['down', 'down'])            StepExecutor.wait_for_screen_to_settle()            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)            self.screen.press(['enter'])            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            self.screen.click(x, y)        except Exception as e:            log_message(f"Error in select_responsabilite step: {str(e)}", WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def perform_accept_optional(self, step_name, images):        log_message("Performing accept_optional", INFO)        try:            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)            self.screen.click(x, y)        except Exception as e:            log_message(f"Error in accept_optional step: {str(e)}", WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def perform_browse(self, step_name, images):        log_message("Performing browse", INFO)        try:            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            self.screen.click(x, y)            self.screen.press(['down', 'enter'])                        StepExecutor.take_screenshot(step_name,report_name=self.report_name)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)            self.screen.press('enter')                    except Exception as e:            log_message(f'Error in browse step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def perform_select_periode(self, step_name, images):        log_message("Performing select periode", INFO)        try:            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            self.screen.click(x + 200, y)            StepExecutor.wait_for_screen_to_settle()            self.screen.press(list(self.get_date_prev_month(step_name,self.date)))            StepExecutor.wait_for_screen_to_settle()            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            self.screen.press('enter')                        StepExecutor.wait_for_screen_to_settle()            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)        except Exception as e:            log_message(f'Error in login step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise        def perform_wait(self, step_name, images):        log_message("Performing wait", INFO)        try:            StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            StepExecutor.wait_for_image_to_disappear(images[0],report_name=self.report_name)        except Exception as e:            log_message(f'Error in wait step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise                def perform_long_wait(self, step_name, images):        log_message("Performing wait", INFO)        try:            StepExecutor.wait_for_screen_to_settle()            StepExecutor.long_wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            StepExecutor.wait_for_screen_to_settle()                    except Exception as e:            log_message(f'Error in wait step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise                def perform_wait_large_query(self, step_name, images):        log_message("Performing wait", INFO)        try:            StepExecutor.wait_for_screen_to_settle()            #Yes Large query or the query already running - both looked up on the same capture            image_file, position = StepExecutor.wait_for_any_image([images[1], images[0]],report_name=self.report_name)            if image_file == images[1]:                x, y = position                self.screen.click(x, y)                StepExecutor.wait_for_screen_to_settle()                StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            #StepExecutor.take_screenshot(step_name+"2",report_name=self.report_name)            StepExecutor.wait_for_image_to_disappear(images[0],report_name=self.report_name)        except Exception as e:            log_message(f'Error in wait step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise        def perform_wait_large_query_duk008(self, step_name, images):        log_message("Performing wait", INFO)        try:            StepExecutor.wait_for_screen_to_settle()            #Yes Large query            #position = StepExecutor.check_image_exists(images[1],report_name=self.report_name)            #if position:            #   x, y = position            #   pyautogui.click(x, y)            #   time.sleep(MIN_SLEEP_TIME)            StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            #StepExecutor.take_screenshot(step_name+"2",report_name=self.report_name)            StepExecutor.wait_for_image_to_disappear(images[0],report_name=self.report_name)        except Exception as e:            log_message(f'Error in wait step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise                def perform_extract(self, step_name, images):        log_message("Performing extract", INFO)        try:            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.long_wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"1",report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"2",report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            destination_folder_path = os.environ.get("LOCAL_DESTINATION_FOLDER_PATH")            file_name = self.get_file_name(step_name,self.date)            destination = os.path.join(destination_folder_path, file_name)            self.watch_download(destination)            x, y = StepExecutor.wait_for_image(images[3],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"3",report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            self.screen.write(destination, interval=0.25)            StepExecutor.take_screenshot(step_name+"4",report_name=self.report_name)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[4],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"5",report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            position = StepExecutor.check_image_exists(images[5],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"6",report_name=self.report_name)            if position:                x, y = position                self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[6],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+"7",report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            position = StepExecutor.check_image_exists(images[5],report_name=self.report_name)            if position:                x, y = position                self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)        except Exception as e:            log_message(f'Error in extract step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise        def perform_extract_ic01(self, step_name, images):        log_message("Performing extract", INFO)        try:            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            destination_folder_path = os.environ.get("LOCAL_DESTINATION_FOLDER_PATH")            file_name = self.get_file_name(step_name,self.date)            destination = os.path.join(destination_folder_path, file_name)            self.watch_download(destination)            x, y = StepExecutor.wait_for_image(images[3],report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            self.screen.write(destination, interval=0.25)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[4],report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            #YES            position = StepExecutor.check_image_exists(images[5],report_name=self.report_name)            if position:                x, y = position                self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[2],report_name=self.report_name)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()                        x, y = StepExecutor.wait_for_image(images[6],report_name=self.report_name)            StepExecutor.take_screenshot(step_name,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            position = StepExecutor.check_image_exists(images[5],report_name=self.report_name)            if position:                x, y = position                self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            StepExecutor.take_screenshot(step_name,report_name=self.report_name)        except Exception as e:            log_message(f'Error in extract step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def watch_download(self, destination):        # Follow the export from before it is saved, a replay never writes it        if self.download is not None:            self.download.stop()        self.download = DownloadWatcher(destination, self.report_name, self.metrics) if self.screen.live else None    def perform_download(self, step_name, images):        log_message("Performing download", INFO)        try:            if self.download is not None:                manifest = self.download.wait(StepExecutor.timeout("download"))                rows = f", {manifest['rows']} rows" if manifest["rows"] is not None else ""                log_message(f"\tFile complete\t:\t{manifest['file']} - {manifest['size']} bytes{rows}, sha256 {manifest['sha256']}", INFO)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[0],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+START,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            x, y = StepExecutor.wait_for_image(images[1],report_name=self.report_name)            StepExecutor.take_screenshot(step_name+END,report_name=self.report_name)            self.screen.click(x, y)            StepExecutor.wait_for_screen_to_settle()            if self.session is None:                self.screen.hotkey('alt', 'f4')                StepExecutor.wait_for_screen_to_settle()                self.screen.hotkey('alt', 'f4')        except Exception as e:            log_message(f'Error in download step: {str(e)}', WARNING)            #return f"FAIL_STEP: {step_name}"            raise    def get_date_prev_month(self, step_name, date=None):        report_config = self.report_config        # Get the specific date format for the given report name from the config        date_format = report_config.get(step_name).get("date_format", "%b-%y")  # Default to "%y-%m-%d" if not specified        if not date:            # Calculate the date for the previous month            today = datetime.now()            # Create a timedelta object representing one month            one_month_ago = timedelta(days=31)  # Adjust for days in different months if needed            # Subtract one month from the current date            date = today - one_month_ago        # Format the previous month's date        previous_month_str = date.strftime(date_format).upper()        log_message(f"\tPeriode\t:\t{previous_month_str}", INFO)        return f"{previous_month_str}"        def get_file_name(self, step_name, date=None):        report_config = self.report_config        # Get the file name components from the environment variable        var_env_file_name = f"FILE_NAME_{self.report_name.upper()}"        file_name_str = os.environ.get(var_env_file_name)        if not file_name_str:            raise ValueError(f"Environment variable {var_env_file_name} is not set")        # Get the specific date format for the given report name from the config        date_format = report_config.get(step_name).get("date_format", "%y-%m-%d")  # Default to "%y-%m-%d" if not specified                if not date:            # Calculate the current date in the desired format            date = datetime.now()            if self.report_name in PREV_MONTH_REPORTS:                # Calculate the date for the previous month                today = datetime.now()                # Create a timedelta object representing one month                one_month_ago = timedelta(days=31)  # Adjust for days in different months if needed                # Subtract one month from the current date                date = today - one_month_ago        date = date.strftime(date_format)        # Split the file name components        file_name_lst = file_name_str.split(",")        # Construct the final file name        file_name = f"{file_name_lst[0]}{date}{file_name_lst[1]}"        log_message(f"\t\tFile-{file_name}", INFO)        return f"{self.report_name}/{file_name}"        #return file_nameclass Step:    def __init__(self, report_name, name, images, action, timeouts=None):        self.report_name = report_name        self.name = name        self.images = images        self.action = action        self.timeouts = timeouts or {}    def execute(self, manager):        #StepExecutor.wait_for_image(self.images[0], report_name = self.report_name)        action_method = manager.actions.get(self.action)        if action_method:            StepExecutor.timeouts = {**DEFAULT_TIMEOUTS, **self.timeouts}            # Execute the action method and check for failures            with StepExecutor.metrics.span("step", self.name, action=self.action):                action_method(self.name, self.images)            #if isinstance(result, str) and result.startswith("FAIL_STEP"):            #    return result  # Return the failure step if it fails        else:            raise ValueError(f"Action {self.action} not found for step {self.name}")class BrowserSession:    """    Logged-in browser kept open between jobs on the same display. The browser runs    in its own process group so it outlives the extraction, and is described by    sessions/session_<display>.json: pid, profile, signature of the session steps    it went through, start time and number of jobs served.    """    def __init__(self, display=None):        display = display or os.environ.get("DISPLAY", ":0")        self.path = os.path.join(SESSION_PATH, f"session_{display.lstrip(':').replace('.', '_')}.json")        self.info = None    def load(self):        try:            with open(self.path, "r") as f:                self.info = json.load(f)        except (OSError, ValueError):            self.info = None        return self.info    def save(self, **info):        self.info = {**(self.info or {}), **info}        os.makedirs(SESSION_PATH, exist_ok=True)        with open(f"{self.path}.tmp", "w") as f:            json.dump(self.info, f, indent=2)        os.replace(f"{self.path}.tmp", self.path)    def alive(self):        # The pid must still be the browser started on the session profile        if not self.info:            return False        try:            with open(f"/proc/{self.info['pid']}/cmdline", "rb") as f:                cmdline = f.read().decode(errors="replace")        except (OSError, KeyError):            return False        return self.info.get("profile", "") in cmdline    def group_exited(self, pgid):        # A browser started by this process stays in its group as a zombie until reaped        try:            os.waitpid(pgid, os.WNOHANG)        except ChildProcessError:            pass        try:            os.killpg(pgid, 0)        except ProcessLookupError:            return True        except PermissionError:            pass        return False    def terminate(self):        """        Sends SIGTERM to the browser process group and waits up to SESSION_CLOSE_TIMEOUT        for it to exit, then SIGKILL, before the session file is removed.        """        if self.info and self.alive():            pgid = self.info["pid"]            try:                os.killpg(pgid, signal.SIGTERM)                deadline = time.monotonic() + SESSION_CLOSE_TIMEOUT                while not self.group_exited(pgid) and time.monotonic() < deadline:                    time.sleep(0.2)                if self.group_exited(pgid):                    log_message(f"Browser session {pgid} closed.", INFO)                else:                    os.killpg(pgid, signal.SIGKILL)                    for _ in range(10):                        if self.group_exited(pgid):                            break                        time.sleep(0.2)                    log_message(f"Browser session {pgid} did not exit within {SESSION_CLOSE_TIMEOUT}s, killed.", WARNING)            except ProcessLookupError:                log_message(f"Browser session {pgid} closed.", INFO)            except OSError as e:                log_message(f"Browser session {pgid} not closed: {str(e)}", WARNING)        self.info = None        if os.path.isfile(self.path):            os.remove(self.path)Point = namedtuple("Point", "x y")class LiveScreen:    """    The real display: captures and input go through pyautogui, time is the system clock.    """    live = True    def screenshot(self):        return pyautogui.screenshot()    def size(self):        return tuple(pyautogui.size())    def click(self, *args, **kwargs):        pyautogui.click(*args, **kwargs)    def doubleClick(self, *args, **kwargs):        pyautogui.doubleClick(*args, **kwargs)    def press(self, *args, **kwargs):        pyautogui.press(*args, **kwargs)    def write(self, *args, **kwargs):        pyautogui.write(*args, **kwargs)    def hotkey(self, *args, **kwargs):        pyautogui.hotkey(*args, **kwargs)    def monotonic(self):        return time.monotonic()    def sleep(self, seconds):        time.sleep(seconds)class ReplayScreen:    """    Plays back the screenshots of a recorded run, e.g. screenshots/<report>/, on a    virtual clock. Frames are ordered by the capture times of the SCREENSHOT_INDEX    written by ScreenshotRecorder, or by modification time for recordings without    one, and each one is shown from its recording offset (or every frame_duration    seconds when given) until the next one. Sleeping only moves the clock forward, and clicks and keypresses    are kept in actions instead of being sent.    """    live = False    def __init__(self, folder, frame_duration=None):        timeline = self.read_index(folder) or self.read_mtimes(folder)        if not timeline:            raise FileNotFoundError(f"No recorded frame in {folder}")        self.frames = [path for _, path in timeline]        if frame_duration is None:            first = timeline[0][0]            self.offsets = [captured_at - first for captured_at, _ in timeline]        else:            self.offsets = [index * frame_duration for index in range(len(frames))]        self.clock = 0.0        self.captures = 0        self.actions = []        self.images = {}    @staticmethod    def read_index(folder):        """        Returns:            list: (capture time, path) of the indexed frames still on disk, in capture order.                  A file captured several times is listed each time. Empty without index.        """        timeline = []        try:            with open(os.path.join(folder, SCREENSHOT_INDEX), "r") as f:                for line in f:                    try:                        entry = json.loads(line)                        path = os.path.join(folder, entry["file"])                        captured_at = float(entry["time"])                    except (ValueError, KeyError, TypeError):                        continue                    if os.path.isfile(path):                        timeline.append((captured_at, path))        except FileNotFoundError:            return []        timeline.sort(key=lambda item: item[0])        return timeline    @staticmethod    def read_mtimes(folder):        frames = [            os.path.join(folder, name) for name in os.listdir(folder)            if name.lower().endswith(REPLAY_EXTENSIONS) and not name.startswith(".")            and os.path.splitext(name)[0] not in REPLAY_SKIPPED        ]        return sorted((os.path.getmtime(path), path) for path in frames)    @property    def frame(self):        return self.frames[bisect.bisect_right(self.offsets, self.clock) - 1]    @property    def finished(self):        return self.clock >= self.offsets[-1]    def size(self):        with Image.open(self.frames[0]) as image:            return image.size    def screenshot(self):        frame = self.frame        if frame not in self.images:            with Image.open(frame) as image:                self.images[frame] = image.convert("RGB")        self.captures += 1        return self.images[frame]    def record(self, action, *args, **kwargs):        self.actions.append({"t": round(self.clock, 3), "frame": os.path.basename(self.frame),                             "action": action, "args": list(args), **kwargs})    def click(self, *args, **kwargs):        self.record("click", *args, **kwargs)    def doubleClick(self, *args, **kwargs):        self.record("doubleClick", *args, **kwargs)    def press(self, *args, **kwargs):        self.record("press", *args, **kwargs)    def write(self, message, interval=0.0):        self.record("write", message)        self.sleep(interval * len(message))    def hotkey(self, *args, **kwargs):        self.record("hotkey", *args, **kwargs)    def monotonic(self):        return self.clock    def sleep(self, seconds):        self.clock += max(0, seconds)class RunMetrics:    """    Times the steps, image waits, captures, matches, sleeps and screenshot saves of a run.    Counters (capture, match, sleep, ...) are cheap additions. A span times a block and    reports the counters accumulated meanwhile, so a wait span tells how much of it went    to captures, template matching and sleeping. In "full" mode every span is written to    stats/runs/<report>_<run_id>.jsonl. In every mode but "off" a summary line is    appended to stats/report_stats.jsonl when the run is closed.    """    def __init__(self, report_name=None, mode=None):        self.report_name = report_name        self.mode = (mode or os.environ.get("METRICS_MODE", METRICS_MODE)).lower()        if report_name is None:            self.mode = "off"        self.enabled = self.mode != "off"        # Set by trigger_report_extraction.sh, which records the runs that die before writing their summary        self.run_id = os.environ.get("METRICS_RUN_ID") or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"        self.started_at = datetime.now()        self.started = time.perf_counter()        self.lock = threading.Lock()        self.counters = {}        self.spans = {}        self.steps = []        self.spans_file = None        if self.mode == "full":            runs_path = os.path.join(METRICS_PATH, "runs")            os.makedirs(runs_path, exist_ok=True)            self.spans_file = open(os.path.join(runs_path, f"{report_name}_{self.run_id}.jsonl"), "a")    def add(self, name, seconds):        if not self.enabled:            return        with self.lock:            counter = self.counters.setdefault(name, [0, 0.0])            counter[0] += 1            counter[1] += seconds    @contextmanager    def span(self, kind, name, **fields):        """        Times the enclosed block. The caller can add fields to the yielded dictionary,        e.g. the outcome of a wait.        """        if not self.enabled:            yield fields            return        with self.lock:            before = {counter: tuple(values) for counter, values in self.counters.items()}        started = time.perf_counter()        try:            yield fields        except BaseException as e:            fields.setdefault("error", type(e).__name__)            raise        finally:            self.close_span(kind, name, time.perf_counter() - started, before, fields)    def close_span(self, kind, name, duration, before, fields):        with self.lock:            for counter, (count, seconds) in self.counters.items():                count_before, seconds_before = before.get(counter, (0, 0.0))                if count > count_before:                    fields[f"{counter}_count"] = count - count_before                    fields[f"{counter}_s"] = round(seconds - seconds_before, 4)        self.record(kind, name, duration, **fields)    def record(self, kind, name, duration, **fields):        # Span timed by the caller, used from the screenshot thread where counter deltas mean nothing        if not self.enabled:            return        with self.lock:            total = self.spans.setdefault(f"{kind}:{name}", {"count": 0, "seconds": 0.0, "max_s": 0.0})            total["count"] += 1            total["seconds"] += duration            total["max_s"] = max(total["max_s"], duration)            if kind == "step":                self.steps.append({"name": name, "duration_s": round(duration, 3), **fields})            if self.spans_file is not None:                span = {"ts": datetime.now().isoformat(timespec="milliseconds"), "kind": kind, "name": name,                        "duration_s": round(duration, 4), **fields}                self.spans_file.write(json.dumps(span, default=str) + "\n")                self.spans_file.flush()    def close(self, result, screenshots_dropped=0):        """        Appends the summary of the run to the stats file.        Args:            result (str): "Success" or the error message returned by AutomationManager.start.        """        if not self.enabled:            return        status = "SUCCESS" if result == "Success" else "FAIL"        with self.lock:            summary = {                "datetime": self.started_at.strftime("%Y-%m-%d %H:%M:%S"),                "report_name": self.report_name,                "run_id": self.run_id,                "worker": os.environ.get("WORKER_ID"),                "status": status,                "duration_s": round(time.perf_counter() - self.started, 3),                "steps": self.steps,                "counters": {counter: {"count": count, "seconds": round(seconds, 3)}                             for counter, (count, seconds) in self.counters.items()},                "spans": {key: {"count": total["count"], "seconds": round(total["seconds"], 3),                                "max_s": round(total["max_s"], 3)}                          for key, total in self.spans.items()},                "screenshots_dropped": screenshots_dropped,            }            if status == "FAIL":                summary["error"] = result            if self.spans_file is not None:                self.spans_file.write(json.dumps({"kind": "summary", **summary}, default=str) + "\n")                self.spans_file.close()                self.spans_file = None        os.makedirs(METRICS_PATH, exist_ok=True)        with open(os.path.join(METRICS_PATH, METRICS_SUMMARY_FILE), "a") as f:            f.write(json.dumps(summary, default=str) + "\n")        log_message(f"Run metrics - {status} in {summary['duration_s']}s, run id {self.run_id}", INFO)def display_key(width, height, dpi):    return f"{width}x{height}_{dpi}dpi"def current_dpi():    return int(os.environ.get("VSCREEN_DPI", BASE_DISPLAY[2]))def rescale_template(template, scale):    height, width = template.shape[:2]    size = (max(1, round(width * scale)), max(1, round(height * scale)))    return cv2.resize(template, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)def load_calibration():    """    Returns:        dict: Display key to its calibration (scale, score, anchors, calibrated_at).    """    try:        with open(os.path.join(TEMPLATE_CACHE_PATH, CALIBRATION_FILE), "r") as f:            return json.load(f)    except (OSError, ValueError):        return {}def save_calibration(key, scale, score, anchors):    calibration = load_calibration()    calibration[key] = {        "scale": round(scale, 3),        "score": round(score, 4),        "anchors": anchors,        "calibrated_at": datetime.now().isoformat(timespec="seconds"),    }    os.makedirs(TEMPLATE_CACHE_PATH, exist_ok=True)    path = os.path.join(TEMPLATE_CACHE_PATH, CALIBRATION_FILE)    with open(f"{path}.tmp", "w") as f:        json.dump(calibration, f, indent=2)    os.replace(f"{path}.tmp", path)def calibrate_scale(frame, anchors):    """    Finds the UI scale of a grayscale frame showing at least one of the anchor templates:    a coarse pass over CALIBRATION_SCALES, then a fine pass around its best scale.    Args:        frame (ndarray): Grayscale capture.        anchors (list): Grayscale templates as drawn for BASE_DISPLAY.    Returns:        tuple: Best scale and its correlation score.    """    def best(scales):        results = []        for scale in scales:            score = -1.0            for anchor in anchors:                template = rescale_template(anchor, scale)                if template.shape[0] > frame.shape[0] or template.shape[1] > frame.shape[1]:                    continue                _, max_val, _, _ = cv2.minMaxLoc(cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED))                score = max(score, max_val)            results.append((score, round(float(scale), 3)))        score, scale = max(results)        return scale, score    first, last, step = CALIBRATION_SCALES    scale, score = best(np.arange(first, last + step / 2, step))    fine_scales = np.arange(scale - step, scale + step + CALIBRATION_FINE_STEP / 2, CALIBRATION_FINE_STEP)    return best([fine_scale for fine_scale in fine_scales if fine_scale > 0])def load_anchors(anchor_files):    anchors = []    for anchor_file in anchor_files:        anchor = cv2.imread(anchor_file, cv2.IMREAD_GRAYSCALE)        if anchor is None:            log_message(f"Anchor image could not be read - {anchor_file}", WARNING)            continue        anchors.append(anchor)    if not anchors:        raise FileNotFoundError(f"No anchor image could be read - {anchor_files}")    return anchorsdef detect_scale(screen, anchor_files, timeout):    """    Captures the screen until one of the anchors is recognised at some scale.    Returns:        tuple: Scale and score, None if no anchor was recognised before the timeout.    """    anchors = load_anchors(anchor_files)    matcher = TemplateMatcher(screen=screen)    deadline = screen.monotonic() + timeout    while True:        scale, score = calibrate_scale(matcher.capture(), anchors)        log_message(f"\tBest scale {scale:.2f} with score {score:.4f}", INFO)        if score >= CALIBRATION_CONFIDENCE:            return scale, score        if screen.monotonic() >= deadline:            return None        screen.sleep(CALIBRATION_POLL_INTERVAL)def uncalibrated_display(screen):    """    Returns:        str: Key of the display when it is neither BASE_DISPLAY nor in the calibration file, else None.    """    width, height = screen.size()    dpi = current_dpi()    key = display_key(width, height, dpi)    if (width, height, dpi) == BASE_DISPLAY or key in load_calibration():        return None    return keydef display_template_cache(screen):    """    Template cache of the current display, from its calibration.    Returns:        TemplateCache: None when the templates can be used as drawn, or until the display is calibrated.    """    width, height = screen.size()    key = display_key(width, height, current_dpi())    calibration = load_calibration().get(key)    if calibration is None:        return None    if abs(calibration["scale"] - 1) < CALIBRATION_FINE_STEP / 2:        return None    log_message(f"Display {key} calibrated at scale {calibration['scale']}", INFO)    return TemplateCache(key, calibration["scale"])class TemplateCache:    """    Templates rescaled for a calibrated display, kept on disk as    template_cache/<width>x<height>_<dpi>dpi/<template hash>_<scale>.png so each one    is only resized once per display configuration and template version.    """    def __init__(self, key, scale):        self.key = key        self.scale = round(scale, 3)        self.path = os.path.join(TEMPLATE_CACHE_PATH, key)    def region(self, region):        """        Search region of BASE_DISPLAY pixels on the calibrated display, widened by the        precision of the scale.        """        left, top, width, height = (round(value * self.scale) for value in region)        margin = round(max(BASE_DISPLAY[:2]) * self.scale * CALIBRATION_FINE_STEP)        return max(0, left - margin), max(0, top - margin), width + 2 * margin, height + 2 * margin    def load(self, image_file):        try:            with open(image_file, "rb") as f:                data = f.read()        except OSError:            raise FileNotFoundError(f"Template image could not be read - {image_file}")        digest = hashlib.sha1(data).hexdigest()[:16]        cached_path = os.path.join(self.path, f"{digest}_{self.scale}.png")        template = cv2.imread(cached_path, cv2.IMREAD_GRAYSCALE) if os.path.isfile(cached_path) else None        if template is None:            original = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)            if original is None:                raise FileNotFoundError(f"Template image could not be read - {image_file}")            template = rescale_template(original, self.scale)            os.makedirs(self.path, exist_ok=True)            temp_path = os.path.join(self.path, f".{digest}_{self.scale}.tmp.png")            cv2.imwrite(temp_path, template)            os.replace(temp_path, cached_path)        return template    def precompute(self, folder="images"):        """        Rescales every template of a folder.        Returns:            int: Number of templates in the cache.        """        count = 0        for root, _, names in os.walk(folder):            for name in sorted(names):                if name.lower().endswith(TEMPLATE_EXTENSIONS):                    self.load(os.path.join(root, name))                    count += 1        return countclass TemplateMatcher:    """    Holds every template of a report decoded and in grayscale, and matches them    against a single screen capture per poll.    Optional search regions are read from the step configuration as    "regions": {"<image>": [left, top, width, height]}.    """    def __init__(self, confidence=MATCH_CONFIDENCE, metrics=None, screen=None, cache=None):        self.confidence = confidence        self.metrics = metrics or RunMetrics()        self.screen = screen or LiveScreen()        self.cache = cache        self.templates = {}        self.regions = {}        self.screenshot = None        self.captured_at = None        self.frame = None    def load_report(self, report_config):        for step_details in report_config.values():            for image_file in step_details.get("images", []):                self.load_template(image_file)            for image_file, region in step_details.get("regions", {}).items():                self.regions[image_file] = tuple(region)    def load_template(self, image_file):        if image_file not in self.templates:            if self.cache is not None:                template = self.cache.load(image_file)            else:                template = cv2.imread(image_file, cv2.IMREAD_GRAYSCALE)            if template is None:                raise FileNotFoundError(f"Template image could not be read - {image_file}")            self.templates[image_file] = template        return self.templates[image_file]    def capture(self):        started = time.perf_counter()        self.captured_at = time.time()        self.screenshot = self.screen.screenshot()        self.frame = cv2.cvtColor(np.asarray(self.screenshot), cv2.COLOR_RGB2GRAY)        self.metrics.add("capture", time.perf_counter() - started)        return self.frame    def locate(self, image_file, frame=None):        """        Looks for a template on a frame.        Args:            image_file (str): Path to the template image.            frame (ndarray, optional): Grayscale capture. A new one is taken if not given.        Returns:            Point: Center of the template on screen, None if not found.        """        score, position = self.score(image_file, frame)        if score < self.confidence:            return None        return position    def score(self, image_file, frame=None):        """        Best match of a template on a frame, whatever the confidence.        Returns:            tuple: Correlation score (-1 when the template does not fit) and center of the best match.        """        if frame is None:            frame = self.capture()        template = self.load_template(image_file)        left, top = 0, 0        region = self.regions.get(image_file)        if region:            # Regions are in pixels of BASE_DISPLAY            if self.cache is not None:                region = self.cache.region(region)            left, top, width, height = region            frame = frame[top:top + height, left:left + width]        template_height, template_width = template.shape        if frame.shape[0] < template_height or frame.shape[1] < template_width:            return -1.0, None        started = time.perf_counter()        result = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)        _, max_val, _, max_loc = cv2.minMaxLoc(result)        self.metrics.add("match", time.perf_counter() - started)        return max_val, Point(left + max_loc[0] + template_width // 2, top + max_loc[1] + template_height // 2)    def locate_all(self, image_files, frame=None):        """        Matches several templates against the same capture.        Returns:            dict: Template path to its center on screen (None if not found).        """        if frame is None:            frame = self.capture()        return {image_file: self.locate(image_file, frame) for image_file in image_files}class ScreenWatcher:    """    Captures the screen and tracks when it last changed, comparing downscaled    frames. The delay between polls doubles while nothing changes and goes    back to POLL_INTERVAL as soon as something does.    """    def __init__(self, matcher):        self.matcher = matcher        self.screen = matcher.screen        self.thumbnail = None        self.changed_at = self.screen.monotonic()        self.interval = POLL_INTERVAL    def poll(self):        frame = self.matcher.capture()        thumbnail = frame[::THUMBNAIL_STEP, ::THUMBNAIL_STEP].astype(np.int16)        if self.thumbnail is None or self.thumbnail.shape != thumbnail.shape:            changed = True        else:            changed_pixels = np.count_nonzero(np.abs(thumbnail - self.thumbnail) > CHANGED_PIXEL_DELTA)            changed = changed_pixels > CHANGED_PIXELS_RATIO * thumbnail.size        if changed:            self.changed_at = self.screen.monotonic()            self.interval = POLL_INTERVAL        else:            self.interval = min(self.interval * 2, MAX_POLL_INTERVAL)        self.thumbnail = thumbnail        return frame    def rearm(self):        # A new action was sent, expect the screen to change again soon        self.interval = POLL_INTERVAL    def settled(self, duration=SETTLE_TIME):        return self.screen.monotonic() - self.changed_at >= duration    def sleep(self, deadline=None):        delay = self.interval        if not self.settled():            # Do not overshoot the moment the screen becomes settled            delay = min(delay, max(POLL_INTERVAL, self.changed_at + SETTLE_TIME - self.screen.monotonic()))        if deadline is not None:            delay = max(0, min(delay, deadline - self.screen.monotonic()))        self.screen.sleep(delay)        self.matcher.metrics.add("sleep", delay)class ScreenshotRecorder:    """    Saves screenshots from a background thread fed through a bounded queue, so the    automation never waits on disk I/O. A frame identical to the previous one of    the same folder is hard linked instead of encoded again, and 00_last_state is    a symbolic link to the latest file. Every capture is appended to the SCREENSHOT_INDEX    of its folder with its capture time, which hard links and skipped frames do not    leave in the modification times.    """    def __init__(self, queue_size=SCREENSHOT_QUEUE_SIZE, metrics=None):        self.queue = queue.Queue(maxsize=queue_size)        self.metrics = metrics or RunMetrics()        self.previous = {}        self.indexed = set()        self.dropped = 0        self.thread = threading.Thread(target=self.run, name="screenshot-recorder", daemon=True)        self.thread.start()    def record(self, screenshot, folder, step, captured_at=None):        """        Queues a screenshot to be saved as <folder>/<step>.png.        Args:            captured_at (float, optional): Epoch time of the capture. Defaults to now.        Returns:            bool: False if the queue was full and the screenshot was dropped.        """        try:            self.queue.put_nowait((screenshot, folder, step, captured_at or time.time()))            return True        except queue.Full:            self.dropped += 1            return False    def flush(self):        # Wait until every queued screenshot is on disk        self.queue.join()    def run(self):        while True:            screenshot, folder, step, captured_at = self.queue.get()            started = time.perf_counter()            try:                self.save(screenshot, folder, step, captured_at)            except Exception as e:                logging.warning(f"Screenshot {step} not saved: {str(e)}")            finally:                self.metrics.record("screenshot_save", "recorder", time.perf_counter() - started, step=step, queued=self.queue.qsize())                self.queue.task_done()    def save(self, screenshot, folder, step, captured_at):        os.makedirs(folder, exist_ok=True)        path = os.path.join(folder, f"{step}.{SCREENSHOT_FORMAT}")        temp_path = os.path.join(folder, f".{step}.tmp")        digest = zlib.crc32(screenshot.tobytes())        previous_digest, previous_path = self.previous.get(folder, (None, None))        if digest == previous_digest and os.path.isfile(previous_path):            if previous_path == path:                self.index(folder, path, captured_at)                return            os.link(previous_path, temp_path)        else:            screenshot.save(temp_path, format=SCREENSHOT_FORMAT, compress_level=1)        os.replace(temp_path, path)        self.previous[folder] = (digest, path)        self.index(folder, path, captured_at)        last_state_path = os.path.join(folder, f"00_last_state.{SCREENSHOT_FORMAT}")        temp_link = os.path.join(folder, ".00_last_state.tmp")        if os.path.lexists(temp_link):            os.remove(temp_link)        os.symlink(os.path.basename(path), temp_link)        os.replace(temp_link, last_state_path)    def index(self, folder, path, captured_at):        # The first capture of a run replaces the index left by the previous one        mode = "a" if folder in self.indexed else "w"        with open(os.path.join(folder, SCREENSHOT_INDEX), mode) as f:            f.write(json.dumps({"file": os.path.basename(path), "time": round(captured_at, 3)}) + "\n")        self.indexed.add(folder)class DownloadWatcher:    """    Follows the file an export writes into the destination folder from a background    thread. The folder is watched with inotify, or polled where inotify is not    available. Bytes are hashed and counted as they land, so the sha256, size and    rows are known when the writer is done. The file is complete once its writer has    closed it, or it was renamed into place, and its size has been stable for    DOWNLOAD_STABLE_TIME. The manifest is    then written next to it as <file>.manifest.json for report_transfer.py.    Exports are written sequentially. A file that shrinks or is replaced is hashed again    from the start. A file already at the path when watching starts is only followed    once it changes, so an older export is never taken for the new one.    """    def __init__(self, path, report_name=None, metrics=None):        self.path = path        self.folder = os.path.dirname(path) or "."        self.name = os.path.basename(path)        self.report_name = report_name        self.metrics = metrics or RunMetrics()        self.count_rows = path.lower().endswith(ROW_COUNT_EXTENSIONS)        self.initial = self.signature()        self.started = False        self.closed = False        self.changed_at = time.monotonic()        self.manifest = None        self.error = None        self.done = threading.Event()        self.stopped = threading.Event()        self.reset(None)        os.makedirs(self.folder, exist_ok=True)        self.inotify = self.open_inotify()        self.thread = threading.Thread(target=self.run, name="download-watcher", daemon=True)        self.thread.start()    def signature(self):        try:            stat = os.stat(self.path)        except OSError:            return None        return stat.st_ino, stat.st_size, stat.st_mtime_ns    def reset(self, inode):        self.inode = inode        self.offset = 0        self.rows = 0        self.last_byte = b"\n"        self.sha256 = hashlib.sha256()    def open_inotify(self):        """        Returns:            int: inotify file descriptor watching the folder, None to fall back to polling.        """        try:            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)            if fd < 0:                raise OSError(ctypes.get_errno(), "inotify_init1")            if libc.inotify_add_watch(fd, self.folder.encode(), INOTIFY_MASK) < 0:                error = ctypes.get_errno()                os.close(fd)                raise OSError(error, "inotify_add_watch")            return fd        except (OSError, AttributeError) as e:            log_message(f"\tinotify not available, polling {self.folder}: {str(e)}", WARNING)            return None    def events(self, timeout):        """        Waits up to timeout for events on the file.        Returns:            int: Union of the inotify masks received for the file, 0 when polling.        """        if self.inotify is None:            self.stopped.wait(timeout)            return 0        readable, _, _ = select.select([self.inotify], [], [], timeout)        if not readable:            return 0        try:            data = os.read(self.inotify, 64 * 1024)        except BlockingIOError:            return 0        mask = 0        position = 0        while position + INOTIFY_EVENT.size <= len(data):            _, event_mask, _, length = INOTIFY_EVENT.unpack_from(data, position)            position += INOTIFY_EVENT.size            name = data[position:position + length].rstrip(b"\0").decode(errors="replace")            position += length            if name == self.name:                mask |= event_mask        return mask    def read(self):        """        Hashes and counts the bytes written since the last call.        Returns:            bool: True if the file changed.        """        try:            with open(self.path, "rb") as f:                stat = os.fstat(f.fileno())                if stat.st_ino != self.inode or stat.st_size < self.offset:                    self.reset(stat.st_ino)                if stat.st_size == self.offset:                    return False                f.seek(self.offset)                while True:                    chunk = f.read(DOWNLOAD_CHUNK_SIZE)                    if not chunk:                        break                    self.sha256.update(chunk)                    if self.count_rows:                        self.rows += chunk.count(b"\n")                        self.last_byte = chunk[-1:]                    self.offset += len(chunk)                return True        except FileNotFoundError:            if self.inode is not None:                self.reset(None)                return True            return False    def open_for_writing(self):        # Polling fallback: look for a process holding the file open for writing        try:            pids = [pid for pid in os.listdir("/proc") if pid.isdigit()]        except OSError:            return False        path = os.path.realpath(self.path)        for pid in pids:            fd_path = f"/proc/{pid}/fd"            try:                fds = os.listdir(fd_path)            except OSError:                continue            for fd in fds:                try:                    if os.readlink(os.path.join(fd_path, fd)) != path:                        continue                    with open(f"/proc/{pid}/fdinfo/{fd}") as f:                        flags = next(int(line.split()[1], 8) for line in f if line.startswith("flags:"))                    if flags & (os.O_WRONLY | os.O_RDWR):                        return True                except (OSError, StopIteration, ValueError):                    continue        return False    def complete(self):        if not self.started or self.inode is None or self.offset == 0:            return False        if time.monotonic() - self.changed_at < DOWNLOAD_STABLE_TIME:            return False        if self.inotify is not None:            return self.closed        return not self.open_for_writing()    def run(self):        started = time.perf_counter()        try:            while not self.stopped.is_set():                mask = self.events(DOWNLOAD_POLL_INTERVAL)                if not self.started:                    self.started = bool(mask) or self.signature() != self.initial                    if not self.started:                        continue                    self.changed_at = time.monotonic()                if mask & (INOTIFY_MODIFY | INOTIFY_CREATE):                    self.closed = False                inode = self.inode                if self.read():                    self.changed_at = time.monotonic()                # A file renamed into place was closed under its temporary name, it gets no CLOSE_WRITE                replaced = self.inode is not None and self.inode != inode and not mask & (INOTIFY_MODIFY | INOTIFY_CREATE)                if mask & (INOTIFY_CLOSE_WRITE | INOTIFY_MOVED_TO) or replaced:                    self.closed = True                if self.complete():                    self.manifest = self.write_manifest()                    self.metrics.record("download", self.name, time.perf_counter() - started,                                        size=self.offset, rows=self.manifest["rows"], inotify=self.inotify is not None)                    break        except Exception as e:            self.error = e        finally:            if self.inotify is not None:                os.close(self.inotify)                self.inotify = None            self.done.set()    def write_manifest(self):        rows = None        if self.count_rows:            rows = self.rows + (0 if self.last_byte == b"\n" else 1)        manifest = {            "file": self.name,            "report_name": self.report_name,            "run_id": self.metrics.run_id,            "size": self.offset,            "sha256": self.sha256.hexdigest(),            "rows": rows,            "mtime_ns": os.stat(self.path).st_mtime_ns,            "completed_at": datetime.now().isoformat(timespec="seconds"),        }        manifest_path = self.path + MANIFEST_SUFFIX        with open(f"{manifest_path}.tmp", "w") as f:            json.dump(manifest, f, indent=2)        os.replace(f"{manifest_path}.tmp", manifest_path)        return manifest    def wait(self, timeout):        """        Waits for the file to be complete.        Returns:            dict: The manifest written next to the file.        """        if not self.done.wait(timeout):            self.stop()            raise TimeoutError(f"Download of {self.path} not complete after {timeout}s ({self.offset} bytes received)")        if self.error is not None:            raise self.error        return self.manifest    def stop(self):        self.stopped.set()        self.thread.join()class StepExecutor:    matcher = TemplateMatcher()    watcher = ScreenWatcher(matcher)    timeouts = dict(DEFAULT_TIMEOUTS)    recorder = None    metrics = RunMetrics()    screen = LiveScreen()    @staticmethod    def take_screenshot(step,report_name="",fresh=True):        """        Queues a screenshot for the background recorder.        Args:            step (str): Name of the screenshot file.            report_name (str, optional): Sub folder of the screenshots folder.            fresh (bool, optional): Capture the screen again. When False the last capture                used for image recognition is recorded instead. Defaults to True.        """        # A replay only reads recorded frames, it never writes over them        if SCREENSHOTS and StepExecutor.screen.live:            screenshot = StepExecutor.matcher.screenshot            captured_at = StepExecutor.matcher.captured_at            if fresh or screenshot is None:                started = time.perf_counter()                captured_at = time.time()                screenshot = StepExecutor.screen.screenshot()                StepExecutor.metrics.add("screenshot_capture", time.perf_counter() - started)            if StepExecutor.recorder is None:                StepExecutor.recorder = ScreenshotRecorder(metrics=StepExecutor.metrics)            folder_path = os.path.join(os.environ.get("SCREENSHOTS_PATH", SCREENSHOTS_PATH), str(report_name))            if StepExecutor.recorder.record(screenshot, folder_path, step, captured_at):                log_message(f"\tScreenshot {step}", INFO)            else:                log_message(f"\tScreenshot {step} dropped, recorder queue is full", WARNING)    @staticmethod    def flush_screenshots():        if StepExecutor.recorder is not None:            StepExecutor.recorder.flush()    @staticmethod    def timeout(name):        return StepExecutor.timeouts.get(name, DEFAULT_TIMEOUTS[name])    @staticmethod    def wait_for_screen_to_settle(timeout=None):        """        Waits for the screen to react to the last action: returns once it has        changed and then stayed still for SETTLE_TIME, or when the "settle"        budget of the step runs out.        Returns:            bool: True if the screen settled, False if the budget ran out.        """        watcher = StepExecutor.watcher        timeout = StepExecutor.timeout("settle") if timeout is None else timeout        with StepExecutor.metrics.span("settle", "screen", timeout=timeout) as span:            watcher.rearm()            started_at = StepExecutor.screen.monotonic()            deadline = started_at + timeout            watcher.poll()            while StepExecutor.screen.monotonic() < deadline:                if watcher.changed_at >= started_at and watcher.settled():                    span["settled"] = True                    return True                watcher.sleep(deadline)                watcher.poll()            span["settled"] = False            return False    @staticmethod    def wait_for_image(image_file, report_name="", timeout=None):        image_file, elemUI = StepExecutor.wait_for_any_image([image_file], report_name=report_name, timeout=timeout)        return elemUI    @staticmethod    def long_wait_for_image(image_file, report_name="", timeout=None):        timeout = StepExecutor.timeout("long_wait") if timeout is None else timeout        image_file, elemUI = StepExecutor.wait_for_any_image([image_file], report_name=report_name, timeout=timeout)        return elemUI    @staticmethod    def wait_for_any_image(image_files, report_name="", timeout=None):        """        Waits for the first of several visual elements, matching all of them on each capture.        A match is accepted once the screen has settled or the element stays at the same place        on two captures in a row.        Args:            image_files (list): Paths to the image files, in order of preference.            timeout (float, optional): Budget in seconds. Defaults to the "wait" budget of the step.        Returns:            tuple: The image file found and the coordinates of its center.        """        log_message("\tInitiating image recognition on screen...", INFO)        watcher = StepExecutor.watcher        watcher.rearm()        timeout = StepExecutor.timeout("wait") if timeout is None else timeout        deadline = StepExecutor.screen.monotonic() + timeout        targets = image_files[0] if len(image_files) == 1 else image_files        image_name = os.path.splitext(os.path.basename(image_files[0]))[0]        with StepExecutor.metrics.span("wait_for_image", image_name, targets=image_files, timeout=timeout) as span:            log_message(f"\t\tScanning for visual element \t: {targets}", INFO)            previous = None            attempts = 0            next_report = StepExecutor.screen.monotonic() + MAX_SLEEP_TIME            while True:                attempts += 1                try:                    frame = watcher.poll()                    positions = StepExecutor.matcher.locate_all(image_files, frame)                    found = next(((image_file, positions[image_file]) for image_file in image_files if positions[image_file] is not None), None)                    if found is not None and (watcher.settled() or found == previous):                        log_message(f"\t\tVisual element identified \t\t: {found[0]}", INFO)                        span.update(found=found[0], attempts=attempts)                        return found                    previous = found                except Exception as e:                    log_message(f"\tIssue identifying visual element : {targets}: {str(e)}", WARNING)                now = StepExecutor.screen.monotonic()                if now >= deadline:                    break                if now >= next_report:                    log_message(f"\tMy patience: {str(attempts)} attempts, {int(deadline - now)}s left", WARNING)                    StepExecutor.take_screenshot(image_name+"_searching", report_name=report_name, fresh=False)                    next_report = now + MAX_SLEEP_TIME                watcher.sleep(deadline)            span["attempts"] = attempts            log_message(f"\t\tUnable to identify visual element after {attempts} attempts in {timeout}s \t\t: {targets}", ERROR)            StepExecutor.take_screenshot(image_name+"_notfound", report_name=report_name)            raise FileNotFoundError(f"Image recognition failed - {targets}")    @staticmethod    def wait_for_image_to_disappear(image_file, report_name="", timeout=None):        """        Waits until a visual element has stayed off the screen for the "disappear_confirm"        budget, clicking on it every MIN_SLEEP_TIME seconds meanwhile to prevent inactivity.        Args:            image_file (str): Path to the image file.            timeout (float, optional): Budget in seconds. Defaults to the "disappear" budget                of the step, no limit when not set.        """        watcher = StepExecutor.watcher        watcher.rearm()        timeout = StepExecutor.timeout("disappear") if timeout is None else timeout        deadline = None if timeout is None else StepExecutor.screen.monotonic() + timeout        log_message(f"\tMonitoring for visual element to disappear: {image_file}", INFO)        image_name = os.path.splitext(os.path.basename(image_file))[0]        with StepExecutor.metrics.span("wait_to_disappear", image_name, timeout=timeout) as span:            missing_since = None            next_click = StepExecutor.screen.monotonic()            while deadline is None or StepExecutor.screen.monotonic() < deadline:                try:                    elemUI = StepExecutor.matcher.locate(image_file, watcher.poll())                except Exception as e:                    log_message(f"\tIssue identifying visual element : {image_file}: {str(e)}", WARNING)                    elemUI = None                now = StepExecutor.screen.monotonic()                if elemUI is not None:                    missing_since = None                    if now >= next_click:                        StepExecutor.screen.click(elemUI) #prevent inactivity                        StepExecutor.take_screenshot(image_name+"_current_status", report_name=report_name, fresh=False)                        next_click = now + MIN_SLEEP_TIME                elif missing_since is None:                    log_message(f"\tAwaiting visual element disappearance: {image_file}", INFO)                    missing_since = now                elif now - missing_since >= StepExecutor.timeout("disappear_confirm"):                    log_message(f"\t\tVisual element disappeared \t: {image_file}", INFO)                    StepExecutor.take_screenshot(image_name+"_disappeared", report_name=report_name)                    span["disappeared"] = True                    return                watcher.sleep(deadline)            log_message(f"\t\tVisual element still on screen after {timeout}s \t\t: {image_file}", ERROR)            StepExecutor.take_screenshot(image_name+"_still_visible", report_name=report_name)            raise TimeoutError(f"Visual element did not disappear - {image_file}")        @staticmethod    def check_image_exists(image_file, report_name="", timeout=None):        """        Checks if an image exists on the screen. Gives up when the screen has been still        for twice SETTLE_TIME without showing it, or when the "check" budget runs out.        Args:            image_file (str): Path to the image file.            timeout (float, optional): Budget in seconds. Defaults to the "check" budget of the step.        Returns:            tuple: Coordinates of the image center if found, None otherwise.        """        log_message("\tInitiating image recognition on screen...", INFO)        watcher = StepExecutor.watcher        watcher.rearm()        timeout = StepExecutor.timeout("check") if timeout is None else timeout        deadline = StepExecutor.screen.monotonic() + timeout        log_message(f"\t\tScanning for visual element \t: {image_file}", INFO)        image_name = os.path.splitext(os.path.basename(image_file))[0]        with StepExecutor.metrics.span("check_image", image_name, timeout=timeout) as span:            while True:                try:                    elemUI = StepExecutor.matcher.locate(image_file, watcher.poll())                    if elemUI is not None:                        log_message(f"\t\tVisual element identified \t\t: {image_file}", INFO)                        StepExecutor.take_screenshot(image_name+"_check_found", report_name=report_name)                        span["found"] = True                        return elemUI                except Exception as e:                    log_message(f"\tIssue identifying visual element : {image_file}: {str(e)}", WARNING)                if StepExecutor.screen.monotonic() >= deadline or watcher.settled(2 * SETTLE_TIME):                    break                watcher.sleep(deadline)            StepExecutor.take_screenshot(image_name+"_check_notfound", report_name=report_name)            log_message(f"Visual element not detected: {image_file}", WARNING)            span["found"] = False            return Noneif __name__ == "__main__":    report_name = sys.argv[1] if len(sys.argv) > 1 else "duk008"    config_path = os.path.join("config", f"{report_name}.json")    # Created first so every run gets its summary line, including the ones that fail before starting    metrics = RunMetrics(report_name)    result = "Interrupted"    try:        # Check if the configuration file exists        if not os.path.isfile(config_path):            result = f"Process for report '{report_name}' is not allowed or does not exist."            log_message(result, ERROR)            sys.exit(result)  # Exit with the error message        log_message(f"Loading configuration file : {config_path}", INFO)        # Handle date argument for specific reports        if report_name.lower() in PREV_MONTH_REPORTS:            date = sys.argv[2] if len(sys.argv) > 2 else None            if date:                date = datetime.strptime(date, "%Y-%m-%d").date()        else:            if len(sys.argv) > 2:                log_message("Warning: Date argument is ignored for this report.", WARNING)            date = None        periode_str = f"- periode : {date}" if date is not None else ''        log_message(f"Start extraction for report: {report_name} {periode_str}", INFO)        # Initialize AutomationManager and start the process        manager = AutomationManager(report_name, date=date, metrics=metrics)        result = manager.start()    except Exception as e:        result = f"Main Error: {str(e)}"        log_message(result, ERROR)    finally:        metrics.close(result, StepExecutor.recorder.dropped if StepExecutor.recorder else 0)    # Log and return either "Success" or the error message    if result == "Success":        log_message(f"Extraction Result - {result}", INFO)        sys.exit(0)  # Exit with success    else:        log_message(f"Extraction Failed - {result}", ERROR)        sys.exit(result)  # Exit with the error message
\ No newline at end of file
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+import ftplib
+import json
+import os
+import shutil
+import sys
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+ROUTING_CONFIG = "report_routing_config.json"
+MAX_PARALLEL_TARGETS = 4
+MAX_ATTEMPTS = 3            # Connections tried per target, each one resumes the previous upload
+RETRY_DELAY = 10
+BLOCK_SIZE = 1024 * 1024
+TIMEOUT = 120
+PART_SUFFIX = ".part"       # Remote name of a file until its upload is complete
+# Written by report_extraction.py next to each export once it is complete
+MANIFEST_SUFFIX = ".manifest.json"
+QUARANTINE_FOLDER = "quarantine"   # Files that do not match their manifest, never sent
+
+logging.basicConfig(filename='activity_logs.log', level=logging.INFO, format='%(asctime)s - %(levelname)s \t- %(message)s')
+
+load_dotenv()
+
+
+def log_message(message, level=logging.INFO):
+    print(message)
+    logging.log(level, message)
+
+
+def load_targets(report_name):
+    """
+    Reads the servers a report is delivered to from the routing configuration.
+    Returns:
+        list: Dictionaries with server, port and destination_path.
+    """
+    with open(ROUTING_CONFIG, "r") as f:
+        config = json.load(f)
+    for report in config["reports"]:
+        if report["report_name"] == report_name:
+            return report["servers_targets"]
+    raise ValueError(f"Report '{report_name}' not found in routing config.")
+
+
+def remote_size(ftp, path):
+    try:
+        return ftp.size(path)
+    except ftplib.error_perm:
+        return None
+
+
+def verify_manifest(file_path):
+    """
+    Checks the file is still the one the extraction declared complete, from the size
+    and modification time recorded in its manifest, without reading it again.
+    Returns:
+        str: Why the file must not be sent, None if it matches its manifest.
+    """
+    try:
+        with open(file_path + MANIFEST_SUFFIX, "r") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return "no manifest, the export may be incomplete"
+    except (OSError, ValueError) as e:
+        return f"unreadable manifest: {str(e)}"
+    stat = os.stat(file_path)
+    if stat.st_size != manifest.get("size"):
+        return f"size {stat.st_size} instead of {manifest.get('size')}"
+    if stat.st_mtime_ns != manifest.get("mtime_ns"):
+        return "modified after it was declared complete"
+    return None
+
+
+def manifest_run_id(file_path):
+    try:
+        with open(file_path + MANIFEST_SUFFIX, "r") as f:
+            return json.load(f).get("run_id")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def move_with_manifest(file_path, folder):
+    os.makedirs(folder, exist_ok=True)
+    shutil.move(file_path, os.path.join(folder, os.path.basename(file_path)))
+    if os.path.isfile(file_path + MANIFEST_SUFFIX):
+        shutil.move(file_path + MANIFEST_SUFFIX, os.path.join(folder, os.path.basename(file_path) + MANIFEST_SUFFIX))
+
+
+class ReusedSessionFTP_TLS(ftplib.FTP_TLS):
+    """
+    FTP_TLS whose data connections resume the TLS session of the control connection,
+    as required by vsftpd with require_ssl_reuse and by FileZilla Server.
+    """
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = ftplib.FTP.ntransfercmd(self, cmd, rest)
+        if self._prot_p:
+            conn = self.context.wrap_socket(conn, server_hostname=self.host, session=self.sock.session)
+        return conn, size
+
+
+class TargetUploader:
+    """
+    Uploads files to one server over a single authenticated FTPS control connection,
+    through a temporary .part name resumed with REST, checking the remote size afterwards.
+    """
+    def __init__(self, server, port, destination_path, user, password, use_tls=True):
+        self.server = server
+        self.port = int(port)
+        self.destination_path = destination_path.replace("\\", "/").rstrip("/")
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.ftp = None
+        self.connect_time = 0
+        self.transfer_time = 0
+        self.bytes_sent = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        self.ftp = ReusedSessionFTP_TLS(timeout=TIMEOUT) if self.use_tls else ftplib.FTP(timeout=TIMEOUT)
+        self.ftp.connect(self.server, self.port)
+        self.ftp.login(self.user, self.password)
+        if self.use_tls:
+            self.ftp.prot_p()
+        self.ftp.set_pasv(True)
+        self.ftp.voidcmd("TYPE I")
+        self.connect_time += time.perf_counter() - started
+
+    def close(self):
+        if self.ftp is not None:
+            try:
+                self.ftp.quit()
+            except Exception:
+                self.ftp.close()
+            self.ftp = None
+
+    def upload(self, local_path):
+        """
+        Uploads a file to <name>.part and renames it into place once complete, reconnecting
+        up to MAX_ATTEMPTS times. Only a .part written by an earlier attempt of this call is
+        resumed, a remote file that was already there is always overwritten.
+        Returns:
+            bool: True once the renamed remote file has the size of the local one.
+        """
+        remote_path = f"{self.destination_path}/{os.path.basename(local_path)}"
+        part_path = remote_path + PART_SUFFIX
+        local_size = os.path.getsize(local_path)
+        started_upload = False
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                if self.ftp is None:
+                    self.connect()
+                offset = (remote_size(self.ftp, part_path) or 0) if started_upload else 0
+                if offset > local_size:
+                    offset = 0
+                if offset:
+                    log_message(f"Resuming {part_path} on {self.server} at byte {offset}")
+                started = time.perf_counter()
+                started_upload = True
+                with open(local_path, "rb") as f:
+                    f.seek(offset)
+                    self.ftp.storbinary(f"STOR {part_path}", f, BLOCK_SIZE, rest=offset or None)
+                self.transfer_time += time.perf_counter() - started
+                self.bytes_sent += local_size - offset
+                if remote_size(self.ftp, part_path) != local_size:
+                    log_message(f"Size check failed for {part_path} on {self.server}", logging.WARNING)
+                else:
+                    # Some servers refuse to rename over an existing file
+                    try:
+                        self.ftp.delete(remote_path)
+                    except ftplib.error_perm:
+                        pass
+                    self.ftp.rename(part_path, remote_path)
+                    if remote_size(self.ftp, remote_path) == local_size:
+                        return True
+                    log_message(f"Size check failed for {remote_path} on {self.server}", logging.WARNING)
+            except (ftplib.Error, OSError, EOFError) as e:
+                log_message(f"Attempt {attempt}/{MAX_ATTEMPTS} to send {remote_path} to {self.server} failed: {str(e)}", logging.WARNING)
+                self.close()
+            if attempt < MAX_ATTEMPTS:
+                time.sleep(RETRY_DELAY)
+        return False
+
+    def upload_all(self, files):
+        """
+        Returns:
+            dict: File path to True when it was delivered and verified.
+        """
+        try:
+            return {file_path: self.upload(file_path) for file_path in files}
+        finally:
+            self.close()
+
+    def stats(self):
+        throughput = self.bytes_sent / self.transfer_time / 1024 / 1024 if self.transfer_time else 0
+        return f"{self.server}: connect {self.connect_time:.2f}s, {self.bytes_sent} bytes in {self.transfer_time:.2f}s ({throughput:.2f} MB/s)"
+
+
+def transfer_report(report_name, local_dir, user, password, use_tls=True, require_manifest=True, run_id=None):
+    """
+    Sends every file of the report folder to all its targets in parallel and moves
+    the files delivered to at least one target to the archive folder, with their
+    manifest. Files that could not be delivered stay for the next run. Files that
+    do not match their manifest are moved to the quarantine folder and never sent.
+    Args:
+        run_id (str, optional): METRICS_RUN_ID of the extraction whose export this run delivers.
+    Returns:
+        bool: True if the export of run_id was delivered, or every file when no run_id is given.
+    """
+    os.makedirs(local_dir, exist_ok=True)
+    files = sorted(
+        os.path.join(local_dir, name) for name in os.listdir(local_dir)
+        if os.path.isfile(os.path.join(local_dir, name)) and not name.startswith(".")
+        and not name.endswith(MANIFEST_SUFFIX)
+    )
+    if require_manifest:
+        quarantine_dir = os.path.join(local_dir, QUARANTINE_FOLDER)
+        held = []
+        for file_path in files:
+            reason = verify_manifest(file_path)
+            if reason:
+                log_message(f"{os.path.basename(file_path)} not sent, {reason}. File moved to {quarantine_dir}.", logging.ERROR)
+                move_with_manifest(file_path, quarantine_dir)
+                held.append(file_path)
+        files = [file_path for file_path in files if file_path not in held]
+    # Leftovers of earlier runs are sent again but only this run's export sets the result
+    own_files = [file_path for file_path in files if run_id is None or manifest_run_id(file_path) == run_id]
+    if run_id is not None and not own_files:
+        log_message(f"No export of run {run_id} to send in {local_dir}", logging.ERROR)
+    if not files:
+        log_message(f"No file to send in {local_dir}")
+        return run_id is None
+
+    uploaders = [
+        TargetUploader(target["server"], target["port"], target["destination_path"], user, password, use_tls)
+        for target in load_targets(report_name)
+    ]
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_TARGETS, len(uploaders))) as pool:
+        results = list(pool.map(lambda uploader: uploader.upload_all(files), uploaders))
+
+    archive_dir = os.path.join(local_dir, "archive")
+    delivered = True
+    for file_path in files:
+        for uploader, result in zip(uploaders, results):
+            status = "SUCCESS" if result[file_path] else "FAILED"
+            log_message(f"📤 Sending {report_name} to {uploader.server}: {status}")
+        if any(result[file_path] for result in results):
+            move_with_manifest(file_path, archive_dir)
+        else:
+            if file_path in own_files:
+                delivered = False
+            log_message(f"All transfers failed for {os.path.basename(file_path)}. File kept in {local_dir} for retry.", logging.ERROR)
+    for uploader in uploaders:
+        log_message(f"Transfer stats - {uploader.stats()}")
+    return delivered and bool(own_files)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <REPORT_NAME>")
+        sys.exit(1)
+
+    ftp_user = os.environ.get("FTP_USER")
+    ftp_pass = os.environ.get("FTP_PASS")
+    local_folder = os.environ.get("LOCAL_DESTINATION_FOLDER_PATH")
+    valid_reports = os.environ.get("VALID_REPORTS")
+    if not all([ftp_user, ftp_pass, local_folder, valid_reports]):
+        print("Error: Missing environment variables. Please check your .env file.")
+        print("Required: FTP_USER, FTP_PASS, VALID_REPORTS, LOCAL_DESTINATION_FOLDER_PATH")
+        sys.exit(1)
+
+    report_name = sys.argv[1].upper()
+    if report_name not in valid_reports.split(","):
+        print(f"Error: Invalid report name '{report_name}'. Valid options: {valid_reports}")
+        sys.exit(1)
+
+    # FTP_TLS=false allows a plain local FTP server to stand in for the real targets
+    use_tls = os.environ.get("FTP_TLS", "true").lower() != "false"
+    # MANIFEST_REQUIRED=false also sends files dropped in the folder by hand
+    require_manifest = os.environ.get("MANIFEST_REQUIRED", "true").lower() != "false"
+    local_dir = os.path.join(local_folder, report_name.lower())
+    # Set by trigger_report_extraction.sh, a manual run reports on every file of the folder
+    run_id = os.environ.get("METRICS_RUN_ID")
+    # Files that could not be sent stay in the folder for the next run, as before
+    sys.exit(0 if transfer_report(report_name, local_dir, ftp_user, ftp_pass, use_tls, require_manifest, run_id) else 1)
@@ -0,0 +1,275 @@
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import dotenv_values
+
+BASE_PATH = '/root/Desktop/extraction-automation-main'
+
+# Configure logging
+logging.basicConfig(
+    filename=f'{BASE_PATH}/reports_queue/worker_pool.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s'
+)
+
+QUEUE_FILE = f'{BASE_PATH}/reports_queue/reports_queue.json'
+QUEUE_LOCK_FILE = f'{BASE_PATH}/reports_queue/queue.lock'
+# Same semaphore as master_manage_queue.py, both modes never run together
+semaphore_file = f'{BASE_PATH}/reports_queue/manage_queue.lock'
+TRIGGER_SCRIPT = f'{BASE_PATH}/trigger_report_extraction.sh'
+NOTIFICATION_SCRIPT = f'{BASE_PATH}/notifications/notify.sh'
+ARCHIVE_SCRIPT = f'{BASE_PATH}/screenshots/archive_screenshots.sh'
+WORKERS_PATH = f'{BASE_PATH}/workers'
+
+FIRST_DISPLAY = 100          # Worker N runs on Xvfb display :FIRST_DISPLAY+N
+WORKER_MEMORY_MB = 1536      # Firefox 48 + Java applet + Xvfb
+MAX_RETRIES = 10
+RETRY_DELAY = 60             # Seconds a worker waits after a failed extraction
+IDLE_DELAY = 10              # Seconds between checks when only blocked jobs remain
+
+running_reports = set()
+running_lock = threading.Lock()
+
+
+def log(message, level=logging.INFO):
+    logging.log(level, message)
+    print(f'{threading.current_thread().name} - {message}')
+
+
+def available_memory_mb():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def worker_count(settings):
+    """
+    Number of workers: EXTRACTION_WORKERS of .env when set, otherwise as many as
+    the CPUs and the available memory allow.
+    """
+    configured = settings.get('EXTRACTION_WORKERS')
+    if configured:
+        return max(1, int(configured))
+    count = os.cpu_count() or 1
+    memory = available_memory_mb()
+    if memory is not None:
+        count = min(count, memory // WORKER_MEMORY_MB)
+    return max(1, count)
+
+
+class QueueLock:
+    """flock on the same lock file used by add_to_queue.sh and load_schedule.sh."""
+    def __enter__(self):
+        self.fd = os.open(QUEUE_LOCK_FILE, os.O_CREAT | os.O_RDWR)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+
+def read_queue():
+    if not os.path.isfile(QUEUE_FILE):
+        return []
+    with open(QUEUE_FILE) as f:
+        return json.load(f)
+
+
+def write_queue(entries):
+    with open(f'{QUEUE_FILE}.tmp', 'w') as f:
+        json.dump(entries, f, indent=2)
+    os.replace(f'{QUEUE_FILE}.tmp', QUEUE_FILE)
+
+
+def update_entry(job_id, **changes):
+    with QueueLock():
+        entries = read_queue()
+        for entry in entries:
+            if entry['id'] == job_id:
+                entry.update(changes)
+        write_queue(entries)
+
+
+def recover_running_jobs():
+    # Jobs left RUNNING by a previous run that died are retried
+    with QueueLock():
+        entries = read_queue()
+        for entry in entries:
+            if entry['status'] == 'RUNNING':
+                entry['status'] = 'FAIL'
+        write_queue(entries)
+
+
+def claim_job():
+    """
+    Marks the first PENDING/FAIL job whose report is not already running as RUNNING.
+    Returns:
+        tuple: The claimed job (None if none) and whether other jobs are still waiting.
+    """
+    with QueueLock(), running_lock:
+        entries = read_queue()
+        waiting = [entry for entry in entries if entry['status'] in ('PENDING', 'FAIL')]
+        for entry in waiting:
+            if entry['report_name'] in running_reports:
+                continue
+            job = dict(entry)
+            entry['status'] = 'RUNNING'
+            write_queue(entries)
+            running_reports.add(job['report_name'])
+            return job, True
+        return None, bool(waiting) or bool(running_reports)
+
+
+def release_report(report_name):
+    with running_lock:
+        running_reports.discard(report_name)
+
+
+def notify(report_name, status, message=None):
+    cmd = [NOTIFICATION_SCRIPT, report_name, status]
+    if message:
+        cmd.append(message)
+    subprocess.run(cmd)
+
+
+def archive_screenshots(report_name, env):
+    if os.path.isfile(ARCHIVE_SCRIPT):
+        subprocess.run(['bash', ARCHIVE_SCRIPT, report_name], env=env)
+
+
+def prepare_worker(worker_id, settings):
+    """
+    Creates the worker folders and its own copy of the Firefox profile. The trigger
+    always runs the extractions of a worker on its own Xvfb display, even without HEADLESS.
+    Returns:
+        dict: Environment of the extractions run by the worker.
+    """
+    worker_path = os.path.join(WORKERS_PATH, f'worker_{worker_id}')
+    profile_path = os.path.join(worker_path, 'firefox_profile')
+    source_profile = settings.get('FIREFOX_PROFILE_PATH')
+    if source_profile and not os.path.isdir(profile_path):
+        log(f'Copying Firefox profile {source_profile} to {profile_path}')
+        shutil.copytree(source_profile, profile_path, symlinks=True,
+                        ignore=shutil.ignore_patterns('lock', '.parentlock', 'parent.lock'))
+
+    env = dict(os.environ)
+    env.update({
+        'WORKER_ID': str(worker_id),
+        'WORKER_DISPLAY': str(FIRST_DISPLAY + worker_id),
+        'FIREFOX_PROFILE_PATH': profile_path,
+        'SCREENSHOTS_PATH': os.path.join(worker_path, 'screenshots'),
+        'LOCAL_DESTINATION_FOLDER_PATH': os.path.join(worker_path, 'downloads') + '/',
+    })
+    return env
+
+
+def run_extraction(report_name, extraction_month, env):
+    """
+    Runs trigger_report_extraction.sh for a report with the environment of a worker.
+    Returns:
+        bool: True if the extraction succeeded.
+    """
+    os.makedirs(os.path.join(env['SCREENSHOTS_PATH'], report_name), exist_ok=True)
+    os.makedirs(os.path.join(env['LOCAL_DESTINATION_FOLDER_PATH'], report_name), exist_ok=True)
+    cmd = [TRIGGER_SCRIPT, report_name]
+    if extraction_month:
+        cmd.append(extraction_month)
+    log(f'Running extraction for report {report_name} on display :{env["WORKER_DISPLAY"]}')
+    result = subprocess.run(cmd, env=env)
+    archive_screenshots(report_name, env)
+    return result.returncode == 0
+
+
+def run_job(job, env):
+    report_name = job['report_name']
+
+    if job['status'] == 'PENDING':
+        log(f'Sending START notification for report {report_name}')
+        notify(report_name, 'START')
+
+    if job['retry_count'] > MAX_RETRIES:
+        log(f'Retry count for report {report_name} with ID {job["id"]} exceeded {MAX_RETRIES}. Marking as FAILED.')
+        notify(report_name, 'FAIL', f'Retry limit reached after {job["retry_count"]} attempts.')
+        update_entry(job['id'], status='FAILED')
+        archive_screenshots(report_name, env)
+        return
+
+    log(f'Processing report {report_name} with ID {job["id"]}, retry count {job["retry_count"]}.')
+    if run_extraction(report_name, job.get('extraction_month'), env):
+        log(f'Report {report_name} with ID {job["id"]} processed successfully.')
+        update_entry(job['id'], status='SUCCESS')
+    else:
+        log(f'Report {report_name} with ID {job["id"]} failed to process. Will retry after {RETRY_DELAY} seconds.', logging.ERROR)
+        update_entry(job['id'], status='FAIL', retry_count=job['retry_count'] + 1)
+        time.sleep(RETRY_DELAY)
+
+
+def worker_loop(worker_id, settings):
+    threading.current_thread().name = f'worker_{worker_id}'
+    env = prepare_worker(worker_id, settings)
+    while True:
+        job, remaining = claim_job()
+        if job is None:
+            if not remaining:
+                log('Queue is empty. Worker exiting.')
+                return
+            time.sleep(IDLE_DELAY)
+            continue
+        try:
+            run_job(job, env)
+        except Exception as e:
+            log(f'Error running report {job["report_name"]}: {str(e)}', logging.ERROR)
+            update_entry(job['id'], status='FAIL', retry_count=job['retry_count'] + 1)
+        finally:
+            release_report(job['report_name'])
+
+
+# Function to acquire the semaphore
+def acquire_semaphore():
+    fd = os.open(semaphore_file, os.O_CREAT | os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return fd
+    except BlockingIOError:
+        os.close(fd)
+        return None
+
+
+# Main function
+def main():
+    fd = acquire_semaphore()
+    if fd is None:
+        log('Queue is already being processed. Exiting.')
+        sys.exit(0)
+
+    try:
+        settings = dotenv_values(f'{BASE_PATH}/.env')
+        workers = worker_count(settings)
+        log(f'Starting worker pool with {workers} workers')
+        recover_running_jobs()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(worker_loop, worker_id, settings) for worker_id in range(workers)]
+        for future in futures:
+            if future.exception():
+                log(f'Worker stopped with an error: {str(future.exception())}', logging.ERROR)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+        log('Worker pool finished.')
+
+
+if __name__ == '__main__':
+    main()
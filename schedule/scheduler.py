@@ -0,0 +1,382 @@
+import fcntl
+import ftplib
+import hashlib
+import heapq
+import io
+import json
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import logging
+from datetime import datetime, timedelta
+from dotenv import dotenv_values
+
+BASE_PATH = '/root/Desktop/extraction-automation-main'
+
+# Configure logging
+logging.basicConfig(
+    filename=f'{BASE_PATH}/schedule/scheduler.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s'
+)
+
+sys.path.insert(0, f'{BASE_PATH}/reports_queue')
+from worker_pool import (prepare_worker, run_extraction, notify, worker_count, acquire_semaphore,  # noqa: E402
+                         QueueLock, read_queue, write_queue, update_entry)
+
+DB_FILE = f'{BASE_PATH}/schedule/scheduler.db'
+REMOTE_SCHEDULE = '02_schedule/schedule_discoverer.json'
+REFRESH_INTERVAL = 300       # Seconds between two downloads of the schedule
+MAX_RETRIES = 10
+RETRY_DELAY = 60             # First retry delay in seconds, doubled on every failure
+MAX_RETRY_DELAY = 1800
+MAX_IDLE = 60                # Longest sleep of the dispatcher
+SEMAPHORE_RETRY = 10         # Seconds between two attempts to take the queue semaphore
+QUEUE_PREFIX = 'queue:'      # Store id prefix of the jobs added with add_to_queue.sh
+
+stop_event = threading.Event()
+wake_event = threading.Event()
+
+
+def log(message, level=logging.INFO):
+    logging.log(level, message)
+    print(f'{datetime.now().strftime("%Y-%m-%d %H:%M:%S")} - {message}')
+
+
+class JobStore:
+    """
+    SQLite copy of the queue, so a restart neither loses nor repeats jobs.
+    Statuses follow reports_queue.json: PENDING, RUNNING, FAIL, SUCCESS, FAILED,
+    plus CANCELLED for jobs removed from the schedule before they ran. Jobs taken
+    from reports_queue.json are stored with their queue id prefixed by QUEUE_PREFIX.
+    """
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' report_name TEXT NOT NULL,'
+            ' extraction_month TEXT,'
+            ' run_at TEXT NOT NULL,'
+            ' next_attempt_at TEXT NOT NULL,'
+            ' status TEXT NOT NULL,'
+            ' retry_count INTEGER NOT NULL DEFAULT 0)'
+        )
+        self.db.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)')
+        self.db.commit()
+
+    def get_state(self, key):
+        with self.lock:
+            row = self.db.execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+            return row['value'] if row else None
+
+    def set_state(self, key, value):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)', (key, value))
+            self.db.commit()
+
+    def add(self, job):
+        # Jobs are unique by the id of the schedule, known ids are ignored
+        with self.lock:
+            cursor = self.db.execute(
+                'INSERT OR IGNORE INTO jobs (id, report_name, extraction_month, run_at, next_attempt_at, status)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (job['id'], job['report_name'], job.get('extraction_month'), job['run_at'], job['run_at'], 'PENDING'))
+            self.db.commit()
+            return cursor.rowcount == 1
+
+    def cancel_missing(self, ids, since):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id FROM jobs WHERE status = 'PENDING' AND run_at >= ? AND id NOT LIKE ?",
+                (since, f'{QUEUE_PREFIX}%')).fetchall()
+            missing = [row['id'] for row in rows if row['id'] not in ids]
+            self.db.executemany("UPDATE jobs SET status = 'CANCELLED' WHERE id = ?", [(job_id,) for job_id in missing])
+            self.db.commit()
+            return missing
+
+    def update(self, job_id, **changes):
+        columns = ', '.join(f'{column} = ?' for column in changes)
+        with self.lock:
+            self.db.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*changes.values(), job_id))
+            self.db.commit()
+
+    def exists(self, job_id):
+        with self.lock:
+            return self.db.execute('SELECT 1 FROM jobs WHERE id = ?', (job_id,)).fetchone() is not None
+
+    def get(self, job_id):
+        with self.lock:
+            return dict(self.db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+    def waiting(self):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT * FROM jobs WHERE status IN ('PENDING', 'FAIL', 'RUNNING')").fetchall()
+            return [dict(row) for row in rows]
+
+
+def download_schedule(settings):
+    """
+    Downloads schedule_discoverer.json from the FTP server.
+    Returns:
+        bytes: Content of the schedule file.
+    """
+    buffer = io.BytesIO()
+    with ftplib.FTP() as ftp:
+        ftp.connect(settings['FTP_SERVER'], int(settings['FTP_PORT']), timeout=60)
+        ftp.login(settings['FTP_USER'], settings['FTP_PASS'])
+        ftp.retrbinary(f'RETR {REMOTE_SCHEDULE}', buffer.write)
+    return buffer.getvalue()
+
+
+def parse_schedule(content, today):
+    """
+    Lists the jobs of the schedule from today on.
+    Returns:
+        list: Jobs with id, report_name, run_at and the optional extraction_month.
+    """
+    jobs = []
+    for day in json.loads(content.decode('utf-8-sig')):
+        if day['date'] < today.isoformat():
+            continue
+        for job in day['jobs']:
+            entry = {
+                'id': job['id'],
+                'report_name': job['report'],
+                'run_at': f'{day["date"]}T{job["hour"]}',
+            }
+            if job.get('extraction_month'):
+                entry['extraction_month'] = job['extraction_month']
+            jobs.append(entry)
+    return jobs
+
+
+class Scheduler:
+    def __init__(self, settings, workers):
+        self.settings = settings
+        self.store = JobStore(DB_FILE)
+        self.heap = []
+        self.running_reports = set()
+        self.lock = threading.Lock()
+        self.free_workers = list(range(workers))
+        self.worker_envs = {worker_id: prepare_worker(worker_id, settings) for worker_id in range(workers)}
+        self.threads = []
+        self.next_refresh = datetime.now()
+
+    def restore(self):
+        # Jobs RUNNING when the scheduler stopped are retried, jobs of previous days are dropped
+        today = datetime.now().date().isoformat()
+        for job in self.store.waiting():
+            if job['run_at'] < today and not job['id'].startswith(QUEUE_PREFIX):
+                log(f'Job {job["id"]} was scheduled before today, cancelled.', logging.WARNING)
+                self.store.update(job['id'], status='CANCELLED')
+                continue
+            if job['status'] == 'RUNNING':
+                self.store.update(job['id'], status='FAIL')
+            heapq.heappush(self.heap, (job['next_attempt_at'], job['id']))
+        log(f'Restored {len(self.heap)} jobs from {DB_FILE}')
+
+    def refresh_schedule(self):
+        self.next_refresh = datetime.now() + timedelta(seconds=REFRESH_INTERVAL)
+        try:
+            content = download_schedule(self.settings)
+        except Exception as e:
+            log(f'Error downloading the schedule: {str(e)}', logging.ERROR)
+            return
+        digest = hashlib.sha256(content).hexdigest()
+        if digest == self.store.get_state('schedule_hash'):
+            return
+
+        today = datetime.now().date()
+        jobs = parse_schedule(content, today)
+        added = 0
+        for job in jobs:
+            # Already taken from reports_queue.json, where load_schedule.sh put it
+            if self.store.exists(f'{QUEUE_PREFIX}{job["id"]}'):
+                continue
+            if self.store.add(job):
+                with self.lock:
+                    heapq.heappush(self.heap, (job['run_at'], job['id']))
+                log(f'Adding job: id={job["id"]}, report_name={job["report_name"]}, '
+                    f'extraction_month={job.get("extraction_month", "")}, run_at={job["run_at"]}')
+                added += 1
+        cancelled = self.store.cancel_missing({job['id'] for job in jobs}, today.isoformat())
+        for job_id in cancelled:
+            log(f'Job {job_id} removed from the schedule, cancelled.')
+        self.store.set_state('schedule_hash', digest)
+        log(f'Schedule reloaded: {added} new jobs, {len(cancelled)} cancelled.')
+
+    def import_queue(self):
+        """
+        Takes the PENDING/FAIL jobs of reports_queue.json, added with add_to_queue.sh,
+        so the daemon replaces the cron queue runner. They are marked RUNNING there
+        until they succeed or run out of retries. An entry set back to PENDING after
+        it finished runs again. Entries load_schedule.sh copied from the schedule are
+        already jobs of the store under their own id and are not run twice.
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        with QueueLock():
+            entries = read_queue()
+            waiting = [entry for entry in entries if entry['status'] in ('PENDING', 'FAIL')]
+            if not waiting:
+                return
+            for entry in waiting:
+                if self.store.exists(entry['id']):
+                    entry['status'] = 'RUNNING'
+                    continue
+                job = {
+                    'id': f'{QUEUE_PREFIX}{entry["id"]}',
+                    'report_name': entry['report_name'],
+                    'extraction_month': entry.get('extraction_month'),
+                    'run_at': now,
+                }
+                if not self.store.add(job):
+                    if self.store.get(job['id'])['status'] not in ('SUCCESS', 'FAILED', 'CANCELLED'):
+                        entry['status'] = 'RUNNING'
+                        continue
+                    self.store.update(job['id'], status='PENDING', retry_count=0, next_attempt_at=now)
+                with self.lock:
+                    heapq.heappush(self.heap, (now, job['id']))
+                log(f'Adding queued job: id={entry["id"]}, report_name={entry["report_name"]}, '
+                    f'extraction_month={entry.get("extraction_month", "")}')
+                entry['status'] = 'RUNNING'
+            write_queue(entries)
+
+    def finish_queue_entry(self, job, status):
+        # Schedule jobs may also be in reports_queue.json, under the same id
+        queue_id = job['id'][len(QUEUE_PREFIX):] if job['id'].startswith(QUEUE_PREFIX) else job['id']
+        update_entry(queue_id, status=status)
+
+    def due_jobs(self):
+        """
+        Pops the jobs that are due and can start now: a worker is free and the
+        same report is not already running. The others stay in the queue.
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        ready, deferred = [], []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                next_attempt_at, job_id = heapq.heappop(self.heap)
+                job = self.store.get(job_id)
+                if job['status'] not in ('PENDING', 'FAIL') or job['next_attempt_at'] != next_attempt_at:
+                    continue
+                if len(ready) < len(self.free_workers) and job['report_name'] not in self.running_reports:
+                    self.running_reports.add(job['report_name'])
+                    ready.append(job)
+                else:
+                    deferred.append((next_attempt_at, job_id))
+            for item in deferred:
+                heapq.heappush(self.heap, item)
+            return [(job, self.free_workers.pop()) for job in ready]
+
+    def dispatch(self, job, worker_id):
+        thread = threading.Thread(target=self.run, args=(job, worker_id), name=f'worker_{worker_id}')
+        self.threads = [running for running in self.threads if running.is_alive()]
+        self.threads.append(thread)
+        thread.start()
+
+    def run(self, job, worker_id):
+        report_name = job['report_name']
+        try:
+            if job['status'] == 'PENDING':
+                notify(report_name, 'START')
+            self.store.update(job['id'], status='RUNNING')
+            log(f'Processing report {report_name} with ID {job["id"]}, retry count {job["retry_count"]}.')
+            success = run_extraction(report_name, job['extraction_month'], self.worker_envs[worker_id])
+        except Exception as e:
+            log(f'Error running report {report_name}: {str(e)}', logging.ERROR)
+            success = False
+
+        if success:
+            log(f'Report {report_name} with ID {job["id"]} processed successfully.')
+            self.store.update(job['id'], status='SUCCESS')
+            self.finish_queue_entry(job, 'SUCCESS')
+        else:
+            self.retry(job)
+        with self.lock:
+            self.running_reports.discard(report_name)
+            self.free_workers.append(worker_id)
+        wake_event.set()
+
+    def retry(self, job):
+        retry_count = job['retry_count'] + 1
+        if retry_count > MAX_RETRIES:
+            log(f'Report {job["report_name"]} with ID {job["id"]} failed {retry_count} times. Marking as FAILED.', logging.ERROR)
+            notify(job['report_name'], 'FAIL', f'Retry limit reached after {retry_count} attempts.')
+            self.store.update(job['id'], status='FAILED', retry_count=retry_count)
+            self.finish_queue_entry(job, 'FAILED')
+            return
+        delay = min(RETRY_DELAY * 2 ** (retry_count - 1), MAX_RETRY_DELAY)
+        next_attempt_at = (datetime.now() + timedelta(seconds=delay)).isoformat(timespec='seconds')
+        log(f'Report {job["report_name"]} with ID {job["id"]} failed. Retry {retry_count} at {next_attempt_at}.', logging.WARNING)
+        self.store.update(job['id'], status='FAIL', retry_count=retry_count, next_attempt_at=next_attempt_at)
+        with self.lock:
+            heapq.heappush(self.heap, (next_attempt_at, job['id']))
+
+    def seconds_to_next_event(self):
+        # Due jobs still queued wait for a worker or their report, a finishing run sets wake_event
+        now = datetime.now()
+        next_event = self.next_refresh
+        with self.lock:
+            upcoming = [run_at for run_at, _ in self.heap if run_at > now.isoformat(timespec='seconds')]
+        if upcoming:
+            next_event = min(next_event, datetime.fromisoformat(min(upcoming)))
+        return min(max((next_event - now).total_seconds(), 1), MAX_IDLE)
+
+    def serve(self):
+        self.restore()
+        while not stop_event.is_set():
+            if datetime.now() >= self.next_refresh:
+                self.refresh_schedule()
+            try:
+                self.import_queue()
+            except Exception as e:
+                log(f'Error reading the reports queue: {str(e)}', logging.ERROR)
+            for job, worker_id in self.due_jobs():
+                self.dispatch(job, worker_id)
+            wake_event.wait(self.seconds_to_next_event())
+            wake_event.clear()
+        log('Stopping, waiting for the running extractions.')
+        for thread in self.threads:
+            thread.join()
+
+
+def stop(signum, frame):
+    stop_event.set()
+    wake_event.set()
+
+
+def main():
+    settings = dotenv_values(f'{BASE_PATH}/.env')
+    if not all(settings.get(name) for name in ('FTP_SERVER', 'FTP_PORT', 'FTP_USER', 'FTP_PASS')):
+        log('Missing environment variables. Please configure FTP credentials and server details in .env file.', logging.ERROR)
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    # The workers use the displays and Firefox profiles of worker_pool.py, both never run together.
+    # The daemon also runs the jobs of reports_queue.json, so the cron queue runner just exits.
+    fd = acquire_semaphore()
+    if fd is None:
+        log('Queue is being processed by another runner, waiting for it to finish.')
+    while fd is None:
+        if stop_event.wait(SEMAPHORE_RETRY):
+            return
+        fd = acquire_semaphore()
+
+    try:
+        workers = worker_count(settings)
+        log(f'Starting scheduler with {workers} workers')
+        Scheduler(settings, workers).serve()
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+import argparse
+import sys
+
+import report_extraction as extraction
+from report_extraction import (AutomationManager, LiveScreen, TemplateCache, current_dpi, detect_scale, display_key,
+                               log_message, save_calibration, INFO, WARNING, ERROR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detects the UI scale of the display and caches the rescaled templates.")
+    parser.add_argument("--anchors", nargs="+", default=extraction.CALIBRATION_ANCHORS)
+    parser.add_argument("--scale", type=float, help="Use this scale instead of detecting it")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for an anchor on screen")
+    parser.add_argument("--open-browser", metavar="REPORT",
+                        help="Open the browser as the extraction of REPORT does and calibrate on its login page")
+    parser.add_argument("--images", default="images", help="Folder of the templates to rescale")
+    args = parser.parse_args()
+
+    screen = LiveScreen()
+    width, height = screen.size()
+    key = display_key(width, height, current_dpi())
+    log_message(f"Calibrating display {key}", INFO)
+
+    manager = None
+    try:
+        if args.scale is not None:
+            scale, score = args.scale, 1.0
+        else:
+            if args.open_browser:
+                manager = AutomationManager(args.open_browser)
+                manager.browser_instance = manager.open_browser("FIREFOX")
+            result = detect_scale(screen, args.anchors, args.timeout)
+            if result is None:
+                log_message(f"No anchor recognised on display {key}: {args.anchors}", ERROR)
+                return 1
+            scale, score = result
+    finally:
+        if manager is not None:
+            manager.close_browser()
+
+    save_calibration(key, scale, score, args.anchors)
+    if abs(scale - 1) < extraction.CALIBRATION_FINE_STEP / 2:
+        log_message(f"Display {key} matches the templates as drawn (scale {scale:.2f})", INFO)
+        return 0
+    count = TemplateCache(key, scale).precompute(args.images)
+    if not count:
+        log_message(f"No template found in {args.images}", WARNING)
+    log_message(f"Display {key} calibrated at scale {scale:.2f}, {count} templates cached", INFO)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Runs TargetUploader and transfer_report against a local pyftpdlib server standing in
+for the real targets.
+"""
+import ftplib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+except ImportError:
+    ThreadedFTPServer = None
+
+import report_transfer
+
+USER = "tester"
+PASSWORD = "secret"
+
+
+@unittest.skipIf(ThreadedFTPServer is None, "pyftpdlib is not installed")
+class FTPServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.local_dir = tempfile.mkdtemp()
+        self.remote_dir = tempfile.mkdtemp()
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(USER, PASSWORD, self.remote_dir, perm="elradfmwMT")
+        handler = type("Handler", (FTPHandler,), {"authorizer": authorizer})
+        self.server = ThreadedFTPServer(("127.0.0.1", 0), handler)
+        self.port = self.server.socket.getsockname()[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"timeout": 0.1})
+        self.thread.start()
+        patcher = mock.patch.object(report_transfer, "RETRY_DELAY", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.close_all()
+        self.thread.join()
+        shutil.rmtree(self.local_dir)
+        shutil.rmtree(self.remote_dir)
+
+    def read_remote(self, name):
+        with open(os.path.join(self.remote_dir, name), "rb") as f:
+            return f.read()
+
+
+class TargetUploaderTest(FTPServerTestCase):
+    def make_file(self, name, size):
+        path = os.path.join(self.local_dir, name)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        return path
+
+    def make_uploader(self):
+        return report_transfer.TargetUploader("127.0.0.1", self.port, "/", USER, PASSWORD, use_tls=False)
+
+    def read_local(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_upload_goes_through_part_name(self):
+        path = self.make_file("report.csv", 100000)
+        stored = []
+        original = ftplib.FTP.storbinary
+
+        def storbinary(ftp, cmd, *args, **kwargs):
+            stored.append(cmd)
+            return original(ftp, cmd, *args, **kwargs)
+
+        uploader = self.make_uploader()
+        with mock.patch.object(ftplib.FTP, "storbinary", storbinary):
+            self.assertEqual(uploader.upload_all([path]), {path: True})
+        self.assertEqual(stored, ["STOR /report.csv" + report_transfer.PART_SUFFIX])
+        self.assertEqual(os.listdir(self.remote_dir), ["report.csv"])
+        self.assertEqual(self.read_remote("report.csv"), self.read_local(path))
+
+    def test_resumes_after_dropped_connection(self):
+        path = self.make_file("report.csv", 5 * 4096)
+        offsets = []
+        original = ftplib.FTP.storbinary
+
+        class DroppedConnection:
+            """Gives the first two blocks of the file, then fails like a dropped link."""
+            def __init__(self, f):
+                self.f = f
+                self.blocks = 0
+
+            def read(self, size):
+                self.blocks += 1
+                if self.blocks > 2:
+                    raise ConnectionResetError("connection dropped")
+                return self.f.read(size)
+
+        def storbinary(ftp, cmd, fp, blocksize=8192, callback=None, rest=None):
+            offsets.append(rest or 0)
+            if len(offsets) == 1:
+                fp = DroppedConnection(fp)
+            return original(ftp, cmd, fp, blocksize, callback, rest)
+
+        uploader = self.make_uploader()
+        with mock.patch.object(report_transfer, "BLOCK_SIZE", 4096), \
+                mock.patch.object(ftplib.FTP, "storbinary", storbinary):
+            self.assertEqual(uploader.upload_all([path]), {path: True})
+        self.assertEqual(offsets, [0, 2 * 4096])
+        self.assertEqual(uploader.bytes_sent, 3 * 4096)
+        self.assertEqual(self.read_remote("report.csv"), self.read_local(path))
+
+    def test_overwrites_existing_remote_file(self):
+        with open(os.path.join(self.remote_dir, "report.csv"), "wb") as f:
+            f.write(b"previous export, longer than the new one" * 100)
+        path = self.make_file("report.csv", 1000)
+        uploader = self.make_uploader()
+        self.assertEqual(uploader.upload_all([path]), {path: True})
+        self.assertEqual(os.listdir(self.remote_dir), ["report.csv"])
+        self.assertEqual(self.read_remote("report.csv"), self.read_local(path))
+
+    def test_size_check_failure_is_not_delivered(self):
+        path = self.make_file("report.csv", 1000)
+        uploader = self.make_uploader()
+        with mock.patch.object(report_transfer, "remote_size", return_value=999):
+            self.assertEqual(uploader.upload_all([path]), {path: False})
+        self.assertFalse(os.path.exists(os.path.join(self.remote_dir, "report.csv")))
+
+
+class TransferReportTest(FTPServerTestCase):
+    def setUp(self):
+        super().setUp()
+        routing_config = os.path.join(self.local_dir, "routing.json")
+        with open(routing_config, "w") as f:
+            json.dump({"reports": [{"report_name": "DUK008", "servers_targets": [
+                {"server": "127.0.0.1", "port": self.port, "destination_path": "/"}]}]}, f)
+        patcher = mock.patch.object(report_transfer, "ROUTING_CONFIG", routing_config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.report_dir = os.path.join(self.local_dir, "duk008")
+        os.makedirs(self.report_dir)
+
+    def make_export(self, name, run_id, size=1000):
+        path = os.path.join(self.report_dir, name)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        stat = os.stat(path)
+        with open(path + report_transfer.MANIFEST_SUFFIX, "w") as f:
+            json.dump({"file": name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "run_id": run_id}, f)
+        return path
+
+    def transfer(self, run_id):
+        return report_transfer.transfer_report("DUK008", self.report_dir, USER, PASSWORD, use_tls=False, run_id=run_id)
+
+    def test_mismatched_file_is_quarantined_without_failing_the_run(self):
+        self.make_export("report.csv", "run-2")
+        held = self.make_export("old.csv", "run-1")
+        with open(held, "ab") as f:
+            f.write(b"appended after the manifest")
+        self.assertTrue(self.transfer("run-2"))
+        self.assertEqual(os.listdir(self.remote_dir), ["report.csv"])
+        quarantine_dir = os.path.join(self.report_dir, report_transfer.QUARANTINE_FOLDER)
+        self.assertEqual(sorted(os.listdir(quarantine_dir)), ["old.csv", "old.csv" + report_transfer.MANIFEST_SUFFIX])
+
+    def test_only_the_run_export_sets_the_result(self):
+        self.make_export("report.csv", "run-1")
+        self.assertFalse(self.transfer("run-2"))
+        self.assertEqual(os.listdir(self.remote_dir), ["report.csv"])
+        self.make_export("report2.csv", "run-3")
+        with mock.patch.object(report_transfer.TargetUploader, "upload", return_value=False):
+            self.assertFalse(self.transfer("run-3"))
+        self.assertTrue(os.path.isfile(os.path.join(self.report_dir, "report2.csv")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,5 @@
 #!/bin/bash
 
-# Track the start time
-SECONDS=0
-
 # Change to the directory where the script and virtual environment are located
 cd /root/Desktop/extraction-automation-main
 
@@ -33,6 +30,7 @@ read_env_var "HEADLESS"
 read_env_var "VSCREEN_W"
 read_env_var "VSCREEN_H"
 read_env_var "VSCREEN_DPI"
+read_env_var "SESSION_POOL"
 
 # force dark widgets inside the virtual display
 #export GTK_THEME=Adwaita:dark
@@ -55,12 +53,47 @@ fi
 # Notify that the process has started
 #./notifications/notify.sh "$report_name" "$STATUS_START"
 
+# Worker pool mode: each worker runs on its own Xvfb display number
+xvfb_options=()
+if [ -n "$WORKER_DISPLAY" ]; then
+  xvfb_options=(-n "$WORKER_DISPLAY")
+fi
+# Workers never share the desktop display, each one always gets its own Xvfb
+if [ -n "$WORKER_ID" ] && [ "$HEADLESS" != "true" ]; then
+  echo "Worker $WORKER_ID: running headless on display :${WORKER_DISPLAY}"
+  HEADLESS=true
+fi
+
+# Virtual screen geometry, templates are rescaled for it by template_calibration.py
+export VSCREEN_W="${VSCREEN_W:-1892}" VSCREEN_H="${VSCREEN_H:-880}" VSCREEN_DPI="${VSCREEN_DPI:-96}"
+screen_args="-screen 0 ${VSCREEN_W}x${VSCREEN_H}x24 -dpi ${VSCREEN_DPI}"
+
+# Run id of the summary line report_extraction.py appends to stats/report_stats.jsonl
+export METRICS_RUN_ID="$(date +%Y%m%d_%H%M%S)_$$"
+started_at=$(date '+%Y-%m-%d %H:%M:%S')
+SECONDS=0
+
 # Run the Python script based on HEADLESS mode
-if [ "$HEADLESS" = "true" ]; then
+if [ "$HEADLESS" = "true" ] && [ "$SESSION_POOL" = "true" ]; then
+  # Warm sessions: the browser is kept between runs, so its Xvfb must outlive this run too
+  display_number="${WORKER_DISPLAY:-99}"
+  lock_file="/tmp/.X${display_number}-lock"
+  if [ ! -e "$lock_file" ] || ! kill -0 "$(tr -d ' ' < "$lock_file")" 2>/dev/null; then
+    rm -f "$lock_file"
+    setsid Xvfb ":$display_number" $screen_args < /dev/null > /dev/null 2>&1 &
+    sleep 2
+  fi
+  export DISPLAY=":$display_number"
+  if [ -n "$date" ]; then
+    python_output=$(python3 report_extraction.py "$report_name" "$date" 2>&1)
+  else
+    python_output=$(python3 report_extraction.py "$report_name" 2>&1)
+  fi
+elif [ "$HEADLESS" = "true" ]; then
   if [ -n "$date" ]; then
-    python_output=$(xvfb-run --server-args="-screen 0 1892x880x24 -dpi 96" python3 report_extraction.py "$report_name" "$date" 2>&1)
+    python_output=$(xvfb-run "${xvfb_options[@]}" --server-args="$screen_args" python3 report_extraction.py "$report_name" "$date" 2>&1)
   else
-    python_output=$(xvfb-run --server-args="-screen 0 1892x880x24 -dpi 96" python3 report_extraction.py "$report_name" 2>&1)
+    python_output=$(xvfb-run "${xvfb_options[@]}" --server-args="$screen_args" python3 report_extraction.py "$report_name" 2>&1)
   fi
 else
   if [ -n "$date" ]; then
@@ -73,9 +106,6 @@ fi
 # Check the exit status of the Python script
 exit_status=$?
 
-# Calculate execution time
-execution_time=$SECONDS
-
 if [ $exit_status -ne 0 ]; then
   echo "Python script failed with message: $python_output"
   
@@ -84,15 +114,31 @@ if [ $exit_status -ne 0 ]; then
   #"ERROR on Extraction"
   #"$python_output"
   
-  # Update stats with the failure status and execution time
-  ./stats/append_stats.sh "$report_name" "$execution_time" "$STATUS_FAIL"
+  # The run died before report_extraction.py wrote its summary (xvfb-run, crash): record it here
+  stats_file="stats/report_stats.jsonl"
+  if ! grep -Eiq "^METRICS_MODE=[\"']?off" .env && ! grep -qF "\"run_id\": \"$METRICS_RUN_ID\"" "$stats_file" 2>/dev/null; then
+    mkdir -p stats
+    python3 -c 'import json, sys; print(json.dumps({"datetime": sys.argv[1], "report_name": sys.argv[2], "run_id": sys.argv[3], "worker": sys.argv[4] or None, "status": "FAIL", "duration_s": int(sys.argv[5]), "error": sys.argv[6]}))' \
+      "$started_at" "$report_name" "$METRICS_RUN_ID" "$WORKER_ID" "$SECONDS" "Exit status $exit_status: $python_output" >> "$stats_file"
+  fi
   exit 1
-else
-  # Update stats with the success status and execution time
-  ./stats/append_stats.sh "$report_name" "$execution_time" "$STATUS_SUCCESS"
+fi
+
+# Worker pool mode: hand the file over from the worker download folder to the shared one
+if [ -n "$WORKER_ID" ]; then
+  worker_folder="${LOCAL_DESTINATION_FOLDER_PATH}${report_name}/"
+  read_env_var "LOCAL_DESTINATION_FOLDER_PATH"
+  shared_folder="${LOCAL_DESTINATION_FOLDER_PATH}${report_name}/"
+  mkdir -p "$shared_folder"
+  find "$worker_folder" -maxdepth 1 -type f -exec mv {} "$shared_folder" \;
 fi
 
 # If successful, continue to the next step
 echo "Send File"
-./report_transfer.sh "$report_name"
+# The extraction succeeded: a failed transfer must not make the queue extract the report again.
+# The file stays in the report folder and is sent by the next transfer.
+if ! python3 report_transfer.py "$report_name"; then
+  echo "Transfer of $report_name failed, the file is kept for the next transfer."
+fi
+exit 0
 